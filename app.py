@@ -10,9 +10,10 @@ import opponent
 
 from fishing_game_core.app import FishingDerby, FishingDerbyApp, Fishes, PrintScore2Players, GamesWithBoats
 from fishing_game_core.game_tree import Node
+from fishing_game_core.messages import MinimaxMessages
 
 
-class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesWithBoats):
+class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesWithBoats, MinimaxMessages):
     def __init__(self):
         super().__init__()
         self.minimax_agent_opponent = None  # Implemented minimax model used by the second player
@@ -21,6 +22,7 @@ class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesW
         self.time_sent = None  # Time of last sent state to player loop
         self.time_received = None  # Time of last receive state from player loop
         self.n_timeouts = 0
+        self.observation_table = None  # Observations shared with the player with the shared_memory protocol
         self.load_observations()
 
     def update_clock(self, dl):
@@ -86,13 +88,6 @@ class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesW
         # Kivy receives main widget and draws it
         return self.main_widget
 
-    def send_first_message(self):
-        msg = {}
-        for name, fish in self.fishes.items():
-            msg[name] = {"type": fish.type_fish, "score": fish.score}
-        msg["game_over"] = False
-        self.sender(msg)
-
     def init_minimax(self):
         self.space_subdivisions = self.settings.space_subdivisions
         self.send_first_message()
@@ -122,48 +117,21 @@ class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesW
         # Calculate fishes next move
         self.fishes_next_move()
 
-    def build_minimax_msg(self, msg):
-        msg["hooks_positions"] = {}
-        msg["fishes_positions"] = {}
-        msg["observations"] = {}
-        msg["fish_scores"] = {}
-
-        for i, player in enumerate(self.players):
-            boat = player.boat
-            msg["hooks_positions"][i] = (
-                boat.hook.position.x, boat.hook.position.y)
-
-        for k, fish in self.fishes.items():
-            n = int(k[4:])
-            msg["fishes_positions"][n] = (fish.position.x, fish.position.y)
-            st = fish.updates_cnt
-            msg["observations"][n] = fish.observations_sequence[st:]
-            msg["fish_scores"][n] = fish.score
-
-        caught_fish_names = {0: None,
-                             1: None}
-
-        for p in range(len(self.players)):
-            if self.players[p].boat.has_fish is not None:
-                caught_fish_names[p] = int(
-                    self.players[p].boat.has_fish.name[4:])
-
-        msg["player_scores"] = {}
-        msg["player_scores"][0] = self.players[0].score
-        msg["player_scores"][1] = self.players[1].score
-
-        msg["caught_fish"] = caught_fish_names
-        return msg
-
     def update_specific(self, msg):
-        msg = self.build_minimax_msg(msg)
         if self.current_player == 0:
+            msg = self.build_player_msg(msg)
             self.sender(msg)
             self.time_sent = time()
         else:
+            msg = self.build_minimax_msg(msg)
             initial_tree_node = Node(message=msg, player=1)
             self.action = self.minimax_agent_opponent.next_move(initial_tree_node)
 
+    def on_stop(self):
+        # Free the shared memory block of the observations when the window is closed
+        if self.observation_table is not None:
+            self.observation_table.close(unlink=True)
+
     def do_when_no_fish_left(self):
         self.main_widget.game_over = True
         self.reinitialize_count()
@@ -178,14 +146,6 @@ class FishingDerbyMinimaxApp(FishingDerbyApp, Fishes, PrintScore2Players, GamesW
     def reinitialize_count(self):
         self._cnt_steps = 0
 
-    def check_time_threshold(self):
-        if self.time_received - self.time_sent > self.settings.time_threshold:
-            self.n_timeouts += 1
-            if self.n_timeouts >= 3:
-                raise TimeoutError
-        else:
-            self.n_timeouts = 0
-
     @staticmethod
     def set_seed(seed):
         random.seed(seed)
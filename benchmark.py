@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from fishing_game_core.game_tree import Node
+from fishing_game_core.sequences import Sequences
+from fishing_game_core.shared import OBS_TO_MOVES
+from fishing_game_core.transposition import TranspositionTable
+from main import Settings
+
+OBSERVATION_FILES = ["observations/test_0.json",
+                     "observations/test_1.json",
+                     "observations/test_2.json",
+                     "observations/test_3.json"]
+
+
+def build_root_message(observations_sequence, step):
+    """
+    Build the message the game would send to the player at a given step, with the hooks at their initial
+    positions and no fish caught yet.
+    :param observations_sequence: dict loaded from an observations file
+    :param step: number of fish moves already played
+    :return: dict with the same fields as FishingDerbyMinimaxApp.build_minimax_msg
+    """
+    msg = {"game_over": False,
+           "hooks_positions": {},
+           "fishes_positions": {},
+           "observations": {},
+           "fish_scores": {},
+           "player_scores": {0: 0, 1: 0},
+           "caught_fish": {0: None, 1: None}}
+
+    for i, pos in observations_sequence["init_players"].items():
+        msg["hooks_positions"][int(i)] = tuple(pos)
+
+    for i, fish in observations_sequence["init_fishes"].items():
+        n = int(i)
+        sequence = observations_sequence["sequence"][i]
+        x, y = fish["init_pos"]
+        for obs in sequence[:step]:
+            move_x, move_y = OBS_TO_MOVES[obs]
+            x = (x + move_x) % 20
+            if 0 <= y + move_y < 20:
+                y += move_y
+        msg["fishes_positions"][n] = (x, y)
+        msg["observations"][n] = sequence[step:]
+        msg["fish_scores"][n] = fish["score"]
+
+    return msg
+
+
+def count_nodes(controller):
+    """
+    Wrap the search methods of a controller so that every visited node is counted
+    :param controller: PlayerControllerMinimax instance
+    :return: list whose only element is the running count
+    """
+    counter = [0]
+
+    def counted(search):
+        def counted_search(*args, **kwargs):
+            counter[0] += 1
+            return search(*args, **kwargs)
+        return counted_search
+
+    controller.minimax = counted(controller.minimax)
+    controller.pvs = counted(controller.pvs)
+    return counter
+
+
+def search_fixed_depth(controller, node, depth, iterative=False):
+    """
+    Run a full-width search of the given depth from node, unbounded in time, with the search algorithm of the
+    settings of the controller
+    :param controller: PlayerControllerMinimax instance
+    :param node: root node
+    :param depth: search depth
+    :param iterative: whether to search all the depths up to depth in turn, as the player does, instead of only
+        depth
+    :return: (value, move)
+    """
+    controller.deadline.start(float("inf"))
+    controller.transposition_table = TranspositionTable()
+    controller.new_intercept_tables(node)
+    position = controller.search_position(node)
+    for d in range(1 if iterative else depth, depth + 1):
+        value, move = controller.search(position, d)
+    return value, move
+
+
+def benchmark_file(observations_file, depth, steps, settings, iterative=False):
+    """
+    Search positions taken along the observation sequences of a file
+    :param observations_file: path to an observations file
+    :param depth: search depth
+    :param steps: list of observation steps at which positions are taken
+    :param settings: settings given to the player
+    :param iterative: see search_fixed_depth
+    :return: (visited nodes, elapsed seconds)
+    """
+    from player import PlayerControllerMinimax
+
+    observations_sequence = Sequences().load(observations_file).data
+    controller = PlayerControllerMinimax()
+    controller.load_settings(settings)
+    counter = count_nodes(controller)
+    elapsed = 0.0
+    for step in steps:
+        node = Node(message=build_root_message(observations_sequence, step), player=0)
+        start = time.perf_counter()
+        search_fixed_depth(controller, node, depth, iterative)
+        elapsed += time.perf_counter() - start
+    return counter[0], elapsed
+
+
+def benchmark_workers(observations_files, steps, settings, n_workers):
+    """
+    Search positions taken along the observation sequences of files as the player does in a game, in the time
+    threshold of the settings, with search workers
+    :param observations_files: paths to observations files
+    :param steps: list of observation steps at which positions are taken
+    :param settings: settings given to the player
+    :param n_workers: number of search workers, see PlayerControllerMinimax.start_search_workers
+    :return: list of the depths reached
+    """
+    from player import PlayerControllerMinimax
+
+    controller = PlayerControllerMinimax()
+    controller.load_settings(settings)
+    controller.transposition_table = TranspositionTable(settings.transposition_table_size)
+    controller.evaluation_cache = controller.new_evaluation_cache()
+    controller.start_search_workers(n_workers)
+    depths = []
+    try:
+        for observations_file in observations_files:
+            observations_sequence = Sequences().load(observations_file).data
+            for step in steps:
+                message = build_root_message(observations_sequence, step)
+                node = Node(message=message, player=0)
+                # Every position is a new game: nothing learnt from a previous turn
+                controller.root, controller.principal_variation, controller.reached_depth = None, [], 0
+                controller.turn_start = controller.deadline.clock()
+                controller.search_best_next_move(node, message=dict(message))
+                depths.append(controller.reached_depth)
+    finally:
+        controller.stop_search_workers()
+    return depths
+
+
+if __name__ == '__main__':
+    # Arguments parsing
+    arguments_parser = argparse.ArgumentParser(
+        description="Measure the search speed of the minimax player on the observation files")
+    arguments_parser.add_argument("observations_files", type=str, nargs="*", default=OBSERVATION_FILES,
+                                  help="Observations files")
+    arguments_parser.add_argument("--depth", type=int, default=6, help="Search depth")
+    arguments_parser.add_argument("--positions", type=int, default=10,
+                                  help="Number of positions searched per file")
+    arguments_parser.add_argument("--search-mode", type=str, default="tree", choices=["tree", "make_unmake"],
+                                  help="Search mode of the player")
+    arguments_parser.add_argument("--algorithms", type=str, nargs="+", default=["minimax", "pvs"],
+                                  choices=["minimax", "pvs"],
+                                  help="Search algorithms compared on the same positions")
+    arguments_parser.add_argument("--move-ordering", type=str, default="history", choices=["heuristic", "history"],
+                                  help="Move ordering of the player")
+    arguments_parser.add_argument("--iterative", action="store_true",
+                                  help="Count the nodes to reach the depth by iterative deepening, as the player does")
+    arguments_parser.add_argument("--workers", type=int, nargs="+", default=None,
+                                  help="Instead of searching to a fixed depth, measure the depth reached in the "
+                                       "time threshold with each of these numbers of search workers")
+    args = arguments_parser.parse_args()
+
+    settings = Settings()
+    settings.search_mode = args.search_mode
+    settings.move_ordering = args.move_ordering
+
+    positions = [i * 800 // args.positions for i in range(args.positions)]
+    if args.workers is not None:
+        settings.search_algorithm = args.algorithms[0]
+        for n_workers in args.workers:
+            depths = benchmark_workers(args.observations_files, positions, settings, n_workers)
+            print(f"{settings.search_algorithm}\tworkers: {n_workers}\tmean depth: {sum(depths) / len(depths):.2f}\t"
+                  f"min: {min(depths)}\tmax: {max(depths)}")
+    else:
+        for algorithm in args.algorithms:
+            settings.search_algorithm = algorithm
+            total_nodes, total_time = 0, 0.0
+            for filename in args.observations_files:
+                nodes, seconds = benchmark_file(filename, args.depth, positions, settings, args.iterative)
+                total_nodes += nodes
+                total_time += seconds
+                print(f"{algorithm}\t{filename}\tnodes: {nodes}\ttime: {seconds:.3f} s\tnodes/s: {nodes / seconds:.0f}")
+            print(f"{algorithm}\ttotal\tnodes: {total_nodes}\ttime: {total_time:.3f} s\t"
+                  f"nodes/s: {total_nodes / total_time:.0f}")
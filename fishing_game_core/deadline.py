@@ -0,0 +1,159 @@
+"""
+Deadline of the search of a turn.
+
+Reading the clock at every node takes a noticeable share of the search time. The search instead decrements the
+countdown of a Deadline at every node and only calls check, which reads the clock, when it reaches zero. check
+then sets the countdown from the node rate measured since its previous reading, so that the clock is read about
+every check_period seconds whatever the speed of the search, and never much after the deadline. Once the deadline
+has passed, check raises SearchTimeout, which unwinds the whole search at once: the results of the unfinished
+iteration are never stored, and the search keeps the move of its last completed iteration.
+
+The time the game measures for a turn also includes what happens out of the search: pickling and sending the
+messages, scheduling the processes and, in the app, waiting for a frame. OverheadEstimator learns that time from
+the response times the game sends back, so that the safety margin kept out of the search follows the machine.
+"""
+import math
+import time
+from collections import deque
+
+# Time kept between the end of the search and the time threshold of the game, for the messages and the scheduling
+# of the processes. Default of Settings.search_safety_margin.
+DEFAULT_SAFETY_MARGIN = 20e-3
+# Time between two readings of the clock during a search
+DEFAULT_CHECK_PERIOD = 1e-3
+# Bounds of the number of nodes between two readings of the clock
+MIN_CHECK_INTERVAL = 1
+MAX_CHECK_INTERVAL = 4096
+# Turns measured before the learnt safety margin replaces the fixed one
+MIN_OVERHEAD_SAMPLES = 5
+# Number of the last turns the safety margin is learnt from
+OVERHEAD_WINDOW = 100
+# Percentile of the time out of the search used as safety margin, and time added to it
+OVERHEAD_PERCENTILE = 99
+OVERHEAD_SLACK = 2e-3
+
+
+class SearchTimeout(Exception):
+    """
+    Raised by Deadline.check once the time of the search is over
+    """
+
+
+def search_budget(time_threshold, safety_margin=DEFAULT_SAFETY_MARGIN):
+    """
+    Return the time a search can take
+    :param time_threshold: maximum time between a message of the game and the answer of the player, in seconds
+    :param safety_margin: part of it kept for everything else than the search, in seconds
+    :return: seconds
+    """
+    return max(0.0, time_threshold - safety_margin)
+
+
+class Deadline:
+    def __init__(self, check_period=DEFAULT_CHECK_PERIOD, clock=time.perf_counter):
+        """
+        :param check_period: time between two readings of the clock, in seconds
+        :param clock: function returning the current time in seconds
+        """
+        self.check_period = check_period
+        self.clock = clock
+        self.end = float("inf")
+        # Nodes between the last two readings of the clock. Kept from one search to the next.
+        self.check_interval = MIN_CHECK_INTERVAL
+        # Nodes left until the next reading of the clock, decremented by the search
+        self.countdown = MIN_CHECK_INTERVAL
+        self.last_check = 0.0
+        self.checks = 0
+        # Function telling whether to stop the search before the deadline, read with the clock
+        self.stop = None
+
+    def start(self, budget, start=None, stop=None):
+        """
+        Start the time of a search
+        :param budget: seconds the search can take, float("inf") for no limit
+        :param start: time of self.clock the budget counts from, None for now
+        :param stop: function without arguments returning True when the search must stop before the deadline,
+            called at every reading of the clock, or None
+        :return:
+        """
+        now = self.clock()
+        self.end = (now if start is None else start) + budget
+        self.stop = stop
+        self.last_check = now
+        self.countdown = self.check_interval
+        self.checks = 0
+
+    def expired(self):
+        """
+        Read the clock
+        :return: True if the deadline has passed or the search must stop
+        """
+        return self.clock() >= self.end or (self.stop is not None and self.stop())
+
+    def remaining(self):
+        """
+        :return: seconds left until the deadline
+        """
+        return self.end - self.clock()
+
+    def check(self):
+        """
+        Read the clock and set the countdown until the next reading. Called by the search when the countdown
+        reaches zero.
+        :raise SearchTimeout: if the deadline has passed or the search must stop
+        :return:
+        """
+        now = self.clock()
+        self.checks += 1
+        if now >= self.end or (self.stop is not None and self.stop()):
+            raise SearchTimeout()
+        elapsed = now - self.last_check
+        self.last_check = now
+        if elapsed > 0:
+            nodes_per_second = self.check_interval / elapsed
+            # Read the clock again after check_period, or halfway to the deadline if it is closer
+            period = min(self.check_period, (self.end - now) / 2)
+            interval = int(nodes_per_second * period)
+        else:
+            interval = self.check_interval * 2
+        self.check_interval = min(MAX_CHECK_INTERVAL, max(MIN_CHECK_INTERVAL, interval))
+        self.countdown = self.check_interval
+
+
+class OverheadEstimator:
+    """
+    Time of a turn spent out of the search, from the time between the message of the game and the answer of the
+    player measured by the game, and the time the player spent in its search budget
+    """
+
+    def __init__(self, window=OVERHEAD_WINDOW, percentile=OVERHEAD_PERCENTILE, slack=OVERHEAD_SLACK):
+        """
+        :param window: number of the last turns kept
+        :param percentile: percentile of their time out of the search used as safety margin
+        :param slack: seconds added to that percentile
+        """
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.slack = slack
+
+    def add(self, response_time, search_time):
+        """
+        Record a turn
+        :param response_time: seconds measured by the game
+        :param search_time: seconds the player spent from the reception of the message until the end of its search
+            or of its budget, whichever came first
+        :return:
+        """
+        self.samples.append(max(0.0, response_time - search_time))
+
+    def safety_margin(self, default):
+        """
+        Return the time to keep out of the search
+        :param default: seconds returned until enough turns are recorded
+        :return: seconds
+        """
+        if len(self.samples) < MIN_OVERHEAD_SAMPLES:
+            return default
+        ordered = sorted(self.samples)
+        index = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return ordered[index] + self.slack
@@ -0,0 +1,285 @@
+"""
+Heuristic evaluation of the states of the minimax search.
+
+The value of a state for player 0 is the difference of the scores of the boats, plus the best fish within reach of
+the hook of player 0: the maximum over the fish in the game of score * exp(-distance), with the distance wrapped
+around the x axis as the boats move.
+
+With few fish, a loop in Python is faster than NumPy, whose calls cost more than the whole loop. From
+NUMPY_MIN_FISH fish on, the fish positions and scores are evaluated as arrays in one vectorised pass, and the leaves
+that are siblings in the search are evaluated together, as one array of shape (siblings, fish).
+
+The evaluation can also be incremental, see Evaluator.evaluate_incremental. Free fish follow the trajectories of
+the root, whatever the moves of the boats, so the term of a free fish only depends on the step and on the cell of
+the hook of player 0. Its terms are sorted once for every step and hook cell the search reaches, and every state at
+that step and cell reads its best fish from that ranking, usually the first one, instead of going through all the
+fish. Only the fish on the rods are evaluated from the state.
+
+With the InterceptTables of the search, the rankings read the moves the hook of player 0 needs to meet each free
+fish along its trajectory instead of its distance, see fishing_game_core.intercept. The fish on the rods and the
+steps beyond the horizon of the tables keep the distance.
+
+EvaluationCache keeps the values of the last states evaluated, by zobrist hash and step as the transposition
+table: the same state is evaluated again when a parent orders its children by their heuristic value and then
+reaches them as leaves, or when the search reaches it again through other moves. The step is part of the key
+because the intercept tables value the same state differently at different steps.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from fishing_game_core.game_tree import alive_fish
+from fishing_game_core.tables import BOARD_SIZE, N_CELLS, EXP_NEG_WRAPPED_DISTANCE, EXP_NEG_WRAPPED_DISTANCE_ARRAY
+# Number of fish in the game from which the vectorised evaluation is faster than the loop, measured on the
+# observation files
+NUMPY_MIN_FISH = 16
+# Default number of values kept by EvaluationCache
+DEFAULT_CACHE_ENTRIES = 1 << 16
+
+
+def leaf_fields(state):
+    """
+    Return the fields of a state the evaluation reads. They are immutable, so they can be kept while a SearchState
+    plays other moves.
+    :param state: State or SearchState
+    :return: tuple (hook x, hook y of player 0, fish positions, bitmask of the fish in the game, boat scores)
+    """
+    return state.hooks[0], state.hooks[1], state.fish, state.alive, state.scores
+
+
+def evaluate_fields(hook_x, hook_y, fish, alive, scores, fish_scores):
+    """
+    Evaluate a state from its fields, with a loop over the fish in the game
+    :param hook_x: x position of the hook of player 0
+    :param hook_y: y position of the hook of player 0
+    :param fish: flat tuple of the fish positions, see State.fish
+    :param alive: bitmask of the fish in the game
+    :param scores: scores of the boats
+    :param fish_scores: dict from fish number to score
+    :return: value for player 0
+    """
+    exp_neg_distance = EXP_NEG_WRAPPED_DISTANCE
+    base = (hook_x * BOARD_SIZE + hook_y) * N_CELLS
+    best = max((fish_scores[n] * exp_neg_distance[base + fish[2 * n] * BOARD_SIZE + fish[2 * n + 1]]
+                for n in alive_fish(alive)),
+               default=0)
+    return scores[0] - scores[1] + best
+
+
+class Evaluator:
+    """
+    Evaluation of states, with the fish scores of the game kept as an array indexed by fish number
+    """
+
+    def __init__(self, numpy_min_fish=NUMPY_MIN_FISH):
+        """
+        :param numpy_min_fish: number of fish from which the arrays are used instead of the loop, 0 for always
+        """
+        self.numpy_min_fish = numpy_min_fish
+        # Scores dict of the game the array was built from. It is shared by all the states of a game tree.
+        self.fish_scores = None
+        self.score_array = None
+        self.shifts = None
+        # Trajectories the rankings are computed from, and rankings[step][hook cell]: tuple of (term, fish number)
+        # of the fish of the trajectories, best term first
+        self.trajectories = None
+        self.rankings = {}
+        # InterceptTables the rankings are computed from, or None for the distances
+        self.intercepts = None
+
+    def arrays(self, fish_scores, n_fish):
+        """
+        Return the fish scores as an array, built again only when the game changes
+        :param fish_scores: dict from fish number to score
+        :param n_fish: number of fish numbers in the positions of the states
+        :return: (scores array of shape (n_fish,), array of the fish numbers to shift the bitmasks by)
+        """
+        if fish_scores is not self.fish_scores or len(self.score_array) != n_fish:
+            self.fish_scores = fish_scores
+            self.score_array = np.array([fish_scores.get(n, 0) for n in range(n_fish)], dtype=float)
+            self.shifts = np.arange(n_fish, dtype=np.uint64)
+        return self.score_array, self.shifts
+
+    def new_search(self, step):
+        """
+        Drop the rankings of the steps before the root of a new search, they are not reached again
+        :param step: index in the trajectories of the root of the search
+        :return:
+        """
+        self.rankings = {s: cells for s, cells in self.rankings.items() if s >= step}
+
+    def set_intercepts(self, intercepts):
+        """
+        Compute the rankings from other intercept tables, dropping the rankings computed from the previous ones
+        :param intercepts: InterceptTables of the search, or None to use the distances
+        :return:
+        """
+        if intercepts is not self.intercepts:
+            self.intercepts = intercepts
+            self.rankings = {}
+
+    def ranking(self, trajectories, step, cell, fish_scores):
+        """
+        Return the terms of the free fish at a step for a hook cell, computing them when first reached
+        :param trajectories: FishTrajectories of the game tree
+        :param step: index of the fish positions in the trajectories
+        :param cell: x * BOARD_SIZE + y of the hook of player 0
+        :param fish_scores: dict from fish number to score
+        :return: tuple of (term, fish number), best term first
+        """
+        if trajectories is not self.trajectories:
+            self.trajectories = trajectories
+            self.rankings = {}
+        cells = self.rankings.get(step)
+        if cells is None:
+            cells = self.rankings[step] = {}
+        ranking = cells.get(cell)
+        if ranking is None:
+            intercepts = self.intercepts
+            if intercepts is not None and intercepts.covers(trajectories, step):
+                terms = intercepts.terms(step, cell, fish_scores)
+            else:
+                exp_neg_distance = EXP_NEG_WRAPPED_DISTANCE
+                base = cell * N_CELLS
+                row = trajectories.rows[step]
+                terms = [(fish_scores[n] * exp_neg_distance[base + row[2 * n] * BOARD_SIZE + row[2 * n + 1]], n)
+                         for n in trajectories.fish_numbers]
+            ranking = cells[cell] = tuple(sorted(terms, reverse=True))
+        return ranking
+
+    def evaluate_incremental(self, state, trajectories, step):
+        """
+        Evaluate a state from the ranking of the free fish at its step and hook cell. Same value as evaluate
+        without intercept tables.
+        :param state: State or SearchState
+        :param trajectories: FishTrajectories of the game tree of the state
+        :param step: index of the fish positions of the state in the trajectories, the depth of its node
+        :return: value for player 0
+        """
+        fish_scores = state.fish_scores
+        cell = state.hooks[0] * BOARD_SIZE + state.hooks[1]
+        cells = self.rankings.get(step) if trajectories is self.trajectories else None
+        ranking = cells.get(cell) if cells is not None else None
+        if ranking is None:
+            ranking = self.ranking(trajectories, step, cell, fish_scores)
+        alive, (rod_0, rod_1) = state.alive, state.caught
+        best = None
+        for term, n in ranking:
+            # Fish on a rod are not on their trajectory
+            if alive >> n & 1 and n != rod_0 and n != rod_1:
+                best = term
+                break
+        fish = state.fish
+        base = cell * N_CELLS
+        for n in (rod_0, rod_1):
+            if n != -1:
+                term = fish_scores[n] * EXP_NEG_WRAPPED_DISTANCE[base + fish[2 * n] * BOARD_SIZE + fish[2 * n + 1]]
+                if best is None or term > best:
+                    best = term
+        scores = state.scores
+        return scores[0] - scores[1] + (0 if best is None else best)
+
+    def vectorised(self, state):
+        """
+        :param state: State or SearchState
+        :return: whether the states of its game are evaluated as arrays
+        """
+        return len(state.fish) >= 2 * self.numpy_min_fish
+
+    def evaluate(self, state):
+        """
+        :param state: State or SearchState
+        :return: value for player 0
+        """
+        if not self.vectorised(state):
+            return evaluate_fields(state.hooks[0], state.hooks[1], state.fish, state.alive, state.scores,
+                                   state.fish_scores)
+        return self.evaluate_batch([leaf_fields(state)], state.fish_scores)[0]
+
+    def evaluate_batch(self, leaves, fish_scores):
+        """
+        Evaluate states of the same game together
+        :param leaves: list of leaf_fields of the states
+        :param fish_scores: dict from fish number to score of the game
+        :return: list of values for player 0, in the order of leaves
+        """
+        n_fish = len(leaves[0][2]) // 2
+        if n_fish < self.numpy_min_fish:
+            return [evaluate_fields(*leaf, fish_scores) for leaf in leaves]
+        score_array, shifts = self.arrays(fish_scores, n_fish)
+        hook_x, hook_y, fish, alive, scores = zip(*leaves)
+        positions = np.array(fish).reshape(len(leaves), n_fish, 2)
+        fish_cells = positions[:, :, 0] * BOARD_SIZE + positions[:, :, 1]
+        hook_cells = np.array(hook_x) * BOARD_SIZE + np.array(hook_y)
+        values = score_array * EXP_NEG_WRAPPED_DISTANCE_ARRAY[hook_cells[:, None], fish_cells]
+        if n_fish <= 64:
+            in_game = (np.array(alive, dtype=np.uint64)[:, None] >> shifts & np.uint64(1)).astype(bool)
+        else:
+            # Wider than the integers of NumPy
+            in_game = np.array([[mask >> n & 1 for n in range(n_fish)] for mask in alive], dtype=bool)
+        best = np.where(in_game, values, -np.inf).max(axis=1)
+        best[~in_game.any(axis=1)] = 0.0
+        return [score[0] - score[1] + value for score, value in zip(scores, best.tolist())]
+
+
+class EvaluationCache:
+    """
+    Values of states by zobrist hash and step, bounded to a number of entries. The least recently used value is evicted
+    first. Separate from the transposition table, whose entries are results of searches and are replaced by depth.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        """
+        :param max_entries: maximum number of values kept
+        """
+        self.max_entries = max_entries
+        # key -> value, the least recently used first
+        self.values = OrderedDict()
+        # Counters of the current turn
+        self.lookups = 0
+        self.hits = 0
+
+    def new_search(self):
+        """
+        Reset the counters for a new turn. The values are kept, the states of the next turn are often the same.
+        :return:
+        """
+        self.lookups = 0
+        self.hits = 0
+
+    def get(self, key):
+        """
+        :param key: zobrist hash of a state xored with the key of its step, see zobrist.step_key
+        :return: value of the state, or None if it is not kept
+        """
+        self.lookups += 1
+        value = self.values.get(key)
+        if value is not None:
+            self.hits += 1
+            self.values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Keep the value of a state, evicting the least recently used one if the cache is full
+        :param key: zobrist hash of the state xored with the key of its step
+        :param value: value of the state
+        :return:
+        """
+        values = self.values
+        values[key] = value
+        if len(values) > self.max_entries:
+            values.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove every value and reset the counters
+        :return:
+        """
+        self.values.clear()
+        self.new_search()
+
+    @property
+    def hit_rate(self):
+        """Fraction of the lookups of the current turn that found their state"""
+        return self.hits / self.lookups if self.lookups else 0.0
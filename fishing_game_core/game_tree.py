@@ -1,25 +1,40 @@
 # Game tree for Fishing Derby
 from itertools import product
 import numpy as np
-from fishing_game_core.shared import OBS_TO_MOVES, ACT_TO_MOVES
-from copy import deepcopy
+from fishing_game_core.shared import ACT_TO_MOVES, OBS_TO_MOVES, MOVES_TO_OBS
+from fishing_game_core import zobrist
+from fishing_game_core.tables import (BOARD_SIZE, CELL_X, CELL_Y, DISTINCT_MOVES, N_ACTIONS, N_OBSERVATIONS,
+                                      NEXT_HOOK_CELL, STEP_CELL)
+from fishing_game_core.observations import ObservationSteps
 
 
 class State:
+    """
+    Compact state of the game. Positions are packed in flat tuples, the fish in the game are a bitmask and the fish
+    scores are shared by every state of a game tree, so that creating a child state is cheap. The getters return
+    the usual dict views of these fields.
+    """
+    __slots__ = ("player", "scores", "caught", "hooks", "fish", "alive", "fish_scores", "hash")
+
     def __init__(self, number_of_fish):
         # The current player's index - 0 means MAX and 1 means MIN.
         self.player = None
-        # The player scores: {0: MAX_SCORE, 1: MIN_SCORE}
-        self.player_scores = {}
-        # The index of the caught fish for the two players in a dict.
+        # The player scores: (MAX_SCORE, MIN_SCORE)
+        self.scores = (0, 0)
+        # The index of the caught fish for the two players.
         # The fish index -1 means that no fish has been caught.
-        self.player_caught = {}
-        # The positions of the two hooks, provided as (x,y) coordinate tuples.
-        self.hook_positions = {}
-        # The positions of the uncaught fishes, provided as (x,y) coordinate tuples.
-        self.fish_positions = {}
-        # The score values associated with each fish index.
+        self.caught = (-1, -1)
+        # The positions of the two hooks, flattened: (x0, y0, x1, y1).
+        self.hooks = (0, 0, 0, 0)
+        # The positions of the fishes, flattened and indexed by fish number: (x0, y0, x1, y1, ...).
+        # Only the positions of the fishes in self.alive are meaningful.
+        self.fish = (0, 0) * number_of_fish
+        # Bitmask of the fishes still in the game (free or on a rod): bit i is set for fish number i.
+        self.alive = 0
+        # The score values associated with each fish index. Shared, never copied.
         self.fish_scores = {}
+        # Zobrist hash of the state. See zobrist.py for more information.
+        self.hash = 0
 
     def set_hook_positions(self, player_pos):
         """
@@ -27,9 +42,7 @@ class State:
         :param hook_pos
         :return:
         """
-        p0 = player_pos[0], player_pos[1]
-        p1 = player_pos[2], player_pos[3]
-        self.hook_positions = {0: p0, 1: p1}
+        self.hooks = tuple(player_pos[:4])
 
     def set_player(self, player):
         """
@@ -45,15 +58,15 @@ class State:
         :param scores:
         :return:
         """
-        self.player_scores = {0: score_p0, 1: score_p1}
+        self.scores = (score_p0, score_p1)
 
     def set_fish_scores(self, fish_scores):
         """
-        Set scores of fish
+        Set scores of fish. Fish scores never change during a game, so the dict is shared and not copied.
         :param fish_scores:
         :return:
         """
-        self.fish_scores = deepcopy(fish_scores)
+        self.fish_scores = fish_scores
 
     def set_caught(self, caught):
         """
@@ -63,7 +76,7 @@ class State:
         """
         p0_caught = caught[0] if caught[0] is not None else -1
         p1_caught = caught[1] if caught[1] is not None else -1
-        self.player_caught = {0: p0_caught, 1:p1_caught}
+        self.caught = (p0_caught, p1_caught)
 
     def set_fish_positions(self, fish_number, pos):
         """
@@ -72,14 +85,21 @@ class State:
         :param pos: tuple positions in x and y
         :return:
         """
-        self.fish_positions[fish_number] = pos
+        fish = list(self.fish)
+        if len(fish) < 2 * fish_number + 2:
+            fish.extend((0, 0) * (fish_number + 1 - len(fish) // 2))
+        fish[2 * fish_number] = pos[0]
+        fish[2 * fish_number + 1] = pos[1]
+        self.fish = tuple(fish)
+        self.alive |= 1 << fish_number
 
     def get_hook_positions(self):
         """
         Return the hooks positions
         :return: dict of 2-tuples with (x, y) values of each player's hook
         """
-        return self.hook_positions
+        hooks = self.hooks
+        return {0: (hooks[0], hooks[1]), 1: (hooks[2], hooks[3])}
 
     def get_player(self):
         """
@@ -93,7 +113,7 @@ class State:
         Returns the score for each player
         :return:
         """
-        return self.player_scores[0], self.player_scores[1]
+        return self.scores
 
     def get_fish_scores(self):
         """
@@ -107,10 +127,9 @@ class State:
         Return the caught fish of each player
         :return: 2-tuple with the corresponding fish_number or None for each player
         """
-        p0 = self.player_caught[0]
+        p0, p1 = self.caught
         if p0 == -1:
             p0 = None
-        p1 = self.player_caught[1]
         if p1 == -1:
             p1 = None
         return p0, p1
@@ -120,14 +139,28 @@ class State:
         Return dict of fish positions in current state
         :return: dict of fish_numbers -> 2-tuple with position (x, y)
         """
-        return self.fish_positions
+        fish = self.fish
+        return {k: (fish[2 * k], fish[2 * k + 1]) for k in alive_fish(self.alive)}
+
+    # Read-only views with the names of the former dict fields
+    hook_positions = property(get_hook_positions)
+    fish_positions = property(get_fish_positions)
+
+    @property
+    def player_scores(self):
+        return {0: self.scores[0], 1: self.scores[1]}
+
+    @property
+    def player_caught(self):
+        return {0: self.caught[0], 1: self.caught[1]}
 
     def __repr__(self):
         """
-        Return array visualization of the state. Meant for visualization on a debugger.
+        Return a visualization of the state. Meant for visualization on a debugger.
         :return: str
         """
-        return f"{self.data.tolist()}"
+        return (f"State(player={self.player}, scores={self.scores}, caught={self.caught}, "
+                f"hooks={self.get_hook_positions()}, fish={self.get_fish_positions()})")
 
     def remove_fish(self, fish_number):
         """
@@ -135,33 +168,50 @@ class State:
         :param fish_number:
         :return:
         """
-        del self.fish_positions[fish_number]
+        self.alive &= ~(1 << fish_number)
+
+
+_ALIVE_FISH = {}
+
+
+def alive_fish(mask):
+    """
+    Return the fish numbers set in a bitmask of fishes
+    :param mask: integer
+    :return: tuple of fish numbers in increasing order
+    """
+    fish_numbers = _ALIVE_FISH.get(mask)
+    if fish_numbers is None:
+        fish_numbers = _ALIVE_FISH[mask] = tuple(k for k in range(mask.bit_length()) if mask >> k & 1)
+    return fish_numbers
 
 
 def compute_caught_fish(state, current_fishes_on_rod):
     """
-    Infer caught fish tuple from the state
+    Infer caught fish tuple from the state. Reads the packed fields of the state instead of its dict views.
     :param state: a state instance
+    :param current_fishes_on_rod: 2-tuple - fish on the rod of each player in the previous state, or None
     :return: 2-tuple - caught fish for each player
     """
     caught_fish = [None, None]
     pull_in_fishes = [None, None]
-    hook_positions = state.get_hook_positions()
-    fish_positions = state.get_fish_positions()
-    for player_number in hook_positions:
+    hooks = state.hooks
+    fish = state.fish
+    for player_number in range(2):
         if current_fishes_on_rod[player_number] is not None:
             # A fish was already attached in the previous step
             fish_number = current_fishes_on_rod[player_number]
-            if fish_positions[fish_number][1] >= 19:
+            if fish[2 * fish_number + 1] >= 19:
                 pull_in_fishes[player_number] = fish_number
             else:
                 caught_fish[player_number] = fish_number
         else:
             # Player did not have a fish attached to rod
-            for fish_number in fish_positions:
-                if hook_positions[player_number] == fish_positions[fish_number]:
+            hook_x, hook_y = hooks[2 * player_number], hooks[2 * player_number + 1]
+            for fish_number in alive_fish(state.alive):
+                if fish[2 * fish_number] == hook_x and fish[2 * fish_number + 1] == hook_y:
                     # Pull fish in if it is on the surface
-                    if fish_positions[fish_number][1] >= 19:
+                    if hook_y >= 19:
                         pull_in_fishes[player_number] = fish_number
                     else:
                         caught_fish[player_number] = fish_number
@@ -169,11 +219,211 @@ def compute_caught_fish(state, current_fishes_on_rod):
     return caught_fish, pull_in_fishes
 
 
+# Fish moves of the observation codes, indexed by code
+OBS_MOVES = np.array([OBS_TO_MOVES[code] for code in range(len(OBS_TO_MOVES))])
+
+
+class FishTrajectories:
+    """
+    Positions of the fishes of a root state at every observation step, assuming none of them is caught. Fish do
+    not react to the hooks, so these positions are shared by every node of the game tree and child states only
+    correct the fishes on a rod. Steps are computed with NumPy in chunks, as deep as the search goes.
+    """
+    CHUNK_STEPS = 32
+
+    def __init__(self, state, observations):
+        """
+        :param state: root state
+        :param observations: NumPy array of observation codes of shape (fish, steps), with the fishes of the root
+            state in increasing fish number order
+        """
+        # Fishes of the root state
+        self.alive = state.alive
+        self.fish_numbers = alive_fish(state.alive)
+        self.observations = observations
+        self.steps = observations.shape[1] if self.fish_numbers else 0
+        # positions[step, i] is the (x, y) position of fish self.fish_numbers[i] after step observations
+        self.positions = np.array([[state.fish[2 * k], state.fish[2 * k + 1]] for k in self.fish_numbers],
+                                  dtype=np.int64).reshape(1, len(self.fish_numbers), 2)
+        # rows[step] is positions[step] as a flat tuple indexed by fish number, in the layout of State.fish
+        self.rows = []
+        # hashes[step] is the xor of the zobrist keys of the fishes of the root state at rows[step]
+        self.hashes = []
+        # cells[step] maps a cell to the numbers of the fishes in it at rows[step]
+        self.cells = []
+        self._add_rows(self.positions)
+        self.extend(self.CHUNK_STEPS + 1)
+
+    def extend(self, n_rows):
+        """
+        Make sure the positions of the first n_rows steps are computed
+        :param n_rows: integer
+        :return:
+        """
+        start = len(self.rows)
+        n_rows = min(max(n_rows, 2 * start), self.steps + 1)
+        if n_rows <= start:
+            return
+        moves = OBS_MOVES[self.observations[:, start - 1:n_rows - 1]]
+        x, y = self.positions[-1, :, 0], self.positions[-1, :, 1]
+        xs = (x[:, None] + np.cumsum(moves[:, :, 0], axis=1)) % 20
+        # Fishes stay where they are instead of leaving the board vertically
+        ys = np.empty_like(xs)
+        for i in range(n_rows - start):
+            y = np.clip(y + moves[:, i, 1], 0, 19)
+            ys[:, i] = y
+        chunk = np.stack((xs, ys), axis=2).transpose(1, 0, 2)
+        self.positions = np.concatenate((self.positions, chunk))
+        self._add_rows(chunk)
+
+    def _add_rows(self, chunk):
+        """
+        Append the per step lookups of a chunk of positions
+        :param chunk: NumPy array of shape (steps, fish, 2)
+        :return:
+        """
+        n_slots = self.fish_numbers[-1] + 1 if self.fish_numbers else 0
+        by_number = np.zeros((len(chunk), n_slots, 2), dtype=np.int64)
+        by_number[:, list(self.fish_numbers)] = chunk
+        fish_keys = zobrist.FISH_KEYS
+        for row in by_number.reshape(len(chunk), -1).tolist():
+            h = 0
+            cells = {}
+            for k in self.fish_numbers:
+                c = row[2 * k] * 20 + row[2 * k + 1]
+                h ^= fish_keys[k][c]
+                cells[c] = cells.get(c, ()) + (k,)
+            self.rows.append(tuple(row))
+            self.hashes.append(h)
+            self.cells.append(cells)
+
+    def fish_hash(self, step, alive, caught, fish):
+        """
+        Return the part of the hash of a state made of the keys of its fishes
+        :param step: number of observations played since the root
+        :param alive: bitmask of the fishes of the state
+        :param caught: fish numbers on the rods of the state, -1 for none
+        :param fish: fish positions of the state
+        :return: 64-bit integer
+        """
+        row = self.rows[step]
+        h = self.hashes[step]
+        fish_keys = zobrist.FISH_KEYS
+        removed = self.alive & ~alive
+        if removed:
+            for k in alive_fish(removed):
+                h ^= fish_keys[k][row[2 * k] * 20 + row[2 * k + 1]]
+        for k in caught:
+            if k != -1:
+                keys = fish_keys[k]
+                h ^= keys[row[2 * k] * 20 + row[2 * k + 1]] ^ keys[fish[2 * k] * 20 + fish[2 * k + 1]]
+        return h
+
+
+def distinct_moves(state):
+    """
+    Return the actions of the current player that lead to different states. An action that leaves the hook where it
+    is leads to the same state as "stay": "up" at the surface, "down" at the bottom, and "left" or "right" into the
+    column of the other hook. Only "stay" is kept for them.
+    :param state: current state object instance
+    :return: tuple of integer moves, in increasing order
+    """
+    player = state.player
+    if state.caught[player] != -1:
+        # Next action is always up for the current player
+        return 1,
+    hooks = state.hooks
+    return DISTINCT_MOVES[(hooks[2 * player] * BOARD_SIZE + hooks[2 * player + 1]) * BOARD_SIZE + hooks[2 - 2 * player]]
+
+
+def next_state_fields(state, act, trajectories, step):
+    """
+    Compute the fields of the state reached by playing an action. Shared by Node.compute_next_state, which builds a
+    new State from them, and SearchState.make_move, which updates itself in place.
+    :param state: current state object instance
+    :param act: integer of the move
+    :param trajectories: FishTrajectories of the root of the search
+    :param step: number of observations played from the root to the next state
+    :return: tuple (player, scores, caught, hooks, fish, alive, hash) of the next state
+    """
+    current_player = state.player
+    fishes_on_rod = state.caught
+    alive = state.alive
+    if step >= len(trajectories.rows):
+        trajectories.extend(step + 1)
+    h = state.hash ^ zobrist.PLAYER_KEY ^ trajectories.fish_hash(step - 1, alive, fishes_on_rod, state.fish)
+
+    # Free fishes follow their trajectory, the one on the current player's rod goes up, the one on the other rod stays
+    new_fish = trajectories.rows[step]
+    rod_current, rod_other = fishes_on_rod[current_player], fishes_on_rod[1 - current_player]
+    if rod_current != -1 or rod_other != -1:
+        fish = state.fish
+        new_fish = list(new_fish)
+        if rod_current != -1:
+            y = fish[2 * rod_current + 1]
+            new_fish[2 * rod_current] = fish[2 * rod_current]
+            new_fish[2 * rod_current + 1] = y + 1 if y < 19 else y
+        if rod_other != -1:
+            new_fish[2 * rod_other] = fish[2 * rod_other]
+            new_fish[2 * rod_other + 1] = fish[2 * rod_other + 1]
+        new_fish = tuple(new_fish)
+
+    # Move the current player's hook, which cannot enter the other hook's column
+    hooks = state.hooks
+    i_x = 2 * current_player
+    cell = hooks[i_x] * BOARD_SIZE + hooks[i_x + 1]
+    new_cell = NEXT_HOOK_CELL[(cell * N_ACTIONS + act) * BOARD_SIZE + hooks[2 - i_x]]
+    if new_cell != cell:
+        hook_keys = zobrist.HOOK_KEYS[current_player]
+        h ^= hook_keys[cell] ^ hook_keys[new_cell]
+        new_x, new_y = CELL_X[new_cell], CELL_Y[new_cell]
+        if current_player == 0:
+            hooks = (new_x, new_y, hooks[2], hooks[3])
+        else:
+            hooks = (hooks[0], hooks[1], new_x, new_y)
+
+    # Compute the fish that are currently caught by players, and pull in the ones at the surface
+    scores = state.scores
+    fish_scores = state.fish_scores
+    cells = trajectories.cells[step]
+    next_caught = [-1, -1]
+    for player in (0, 1):
+        k = fishes_on_rod[player]
+        if k == -1:
+            # Player did not have a fish attached to rod. Fishes on a rod are not where their trajectory says.
+            for f in cells.get(hooks[2 * player] * 20 + hooks[2 * player + 1], ()):
+                if alive >> f & 1 and f != rod_current and f != rod_other:
+                    k = f
+                    h ^= zobrist.CAUGHT_KEYS[player][k]
+                    break
+            else:
+                continue
+        if new_fish[2 * k + 1] >= 19:
+            # Pull fish in: it is removed and scores
+            h ^= zobrist.CAUGHT_KEYS[player][k]
+            alive &= ~(1 << k)
+            old_difference = scores[0] - scores[1]
+            if player == 0:
+                scores = (scores[0] + fish_scores[k], scores[1])
+            else:
+                scores = (scores[0], scores[1] + fish_scores[k])
+            h ^= zobrist.score_key(old_difference) ^ zobrist.score_key(scores[0] - scores[1])
+        else:
+            next_caught[player] = k
+
+    next_caught = (next_caught[0], next_caught[1])
+    h ^= trajectories.fish_hash(step, alive, next_caught, new_fish)
+    return 1 - current_player, scores, next_caught, hooks, new_fish, alive, h
+
+
 class Node:
     def __init__(self, root=True, message=None, player=0):
         # A list of the child Nodes, found one level below in the game tree. 
         # NOTE: this field has to be initialized by self.compute_and_get_children().
         self.children = []
+        # The child Nodes of the search of the player computed so far, by move. get_child computes them one at a time,
+        # only when they are needed, from the trajectories of the root instead of compute_next_state.
+        self.children_by_move = {}
         # The current state of the game. See the State class for more information.
         self.state = None
         # The parent Node in the game tree.
@@ -206,6 +456,7 @@ class Node:
         new_node.move = move
         new_node.depth = depth
         new_node.observations = observations
+        new_node.trajectories = self.trajectories
         self.children.append(new_node)
 
         new_node.probability = probability
@@ -221,11 +472,14 @@ class Node:
         self.depth = 0
         self.player = player # Root's player
         obs = curr_state["observations"]
-        keys = sorted(obs.keys())
-        obs = np.array([np.array(obs[k]) for k in keys])
-        obs = obs.T
-        obs = {i: j.tolist() for i, j in enumerate(obs)}
-        self.observations = obs
+        if isinstance(obs, ObservationSteps):
+            # Delta protocol, the observations are a view of the sequences sent in the first message
+            self.observations = obs
+            obs = obs.codes
+        else:
+            keys = sorted(obs.keys())
+            obs = np.array([np.array(obs[k]) for k in keys])
+            self.observations = {i: j.tolist() for i, j in enumerate(obs.T)}
         # Translate message state into state object
         curr_state_s = State(len(curr_state["fishes_positions"].keys()))
         curr_state_s.set_player(self.player)
@@ -244,7 +498,11 @@ class Node:
         fish_scores = curr_state["fish_scores"]
         curr_state_s.set_fish_scores(fish_scores)
 
+        curr_state_s.hash = zobrist.hash_state(curr_state_s)
+
         self.state = curr_state_s  # Root's state object
+        # Fish positions at every step, shared by all the nodes of the tree
+        self.trajectories = FishTrajectories(curr_state_s, obs)
 
     def compute_and_get_children(self):
         """
@@ -262,21 +520,71 @@ class Node:
         current_player = self.state.get_player()
         caught = self.state.get_caught()
         if caught[current_player] is not None:
-            # Next action is always up for the current player
             new_state = self.compute_next_state(self.state, 1, self.observations[self.depth])
             self.add_child(new_state, 1, self.depth+1, self.observations)
         else:
-            # Any action is possible
             for act in range(5):
-                new_state = self.compute_next_state(
-                    self.state, act, self.observations[self.depth])
+                new_state = self.compute_next_state(self.state, act, self.observations[self.depth])
                 self.add_child(new_state, act, self.depth+1, self.observations)
-
         return self.children
 
+    def legal_moves(self):
+        """
+        Return the actions the current player can play, without computing the children. Actions leading to the
+        same state as a lower one are left out, see distinct_moves. compute_and_get_children still returns a child
+        for each of the five actions.
+        :return: tuple of integer moves, empty at the end of the game
+        """
+        if len(self.observations) == self.depth:
+            return ()
+        return distinct_moves(self.state)
+
+    def get_child(self, act):
+        """
+        Return the child reached with an action, computing only this child if it is not computed yet.
+
+        This is how the search generates children lazily: minimax and pvs order legal_moves themselves (table move,
+        killers, countermove, then the rest, see MoveOrdering) and reach each child with NodeCursor.make_move when
+        it is searched, so the children after a cutoff are never computed. SearchState does the same with make_move
+        on a single state, which has no child Nodes for a generator to yield.
+        :param act: integer of the move
+        :return: child Node
+        """
+        child = self.children_by_move.get(act)
+        if child is None:
+            if act not in self.legal_moves():
+                raise ValueError("Move " + str(act) + " is not legal")
+            # Not added to self.children, which only ever holds all the children
+            child = self.__class__(root=False)
+            child.state = self._next_search_state(act)
+            child.parent = self
+            child.move = act
+            child.depth = self.depth + 1
+            child.observations = self.observations
+            child.trajectories = self.trajectories
+            child.probability = 1.0
+            self.children_by_move[act] = child
+        return child
+
+    def _next_search_state(self, act):
+        """
+        Compute the state reached with an action for the search of the player. Fish positions are read from the
+        trajectories of the root at the next depth, see next_state_fields.
+        :param act: integer of the move
+        :return: State
+        """
+        current_state = self.state
+        new_state = State.__new__(State)
+        (new_state.player, new_state.scores, new_state.caught, new_state.hooks, new_state.fish, new_state.alive,
+         new_state.hash) = next_state_fields(current_state, act, self.trajectories, self.depth + 1)
+        new_state.fish_scores = current_state.fish_scores
+        return new_state
+
     def compute_next_state(self, current_state, act, observations):
         """
-        Given a state and an action, compute the next state. Add the next observations as well.
+        Given a state and an action, compute the next state. Add the next observations as well. This is the
+        transition of compute_and_get_children, which the opponent of the game searches; the search of the player
+        goes through get_child instead.
         :param current_state: current state object instance
         :param act: integer of the move
         :param observations: list of observations for current fish
@@ -319,6 +627,7 @@ class Node:
         new_state.set_player_scores(score_p0, score_p1)
 
         new_state.set_caught(next_caught_fish)
+        new_state.hash = zobrist.hash_state(new_state)
 
         return new_state
 
@@ -376,13 +685,135 @@ class Node:
         :param move: 2-tuple. Desired move.
         :return: 2-tuple. pos + move corrected to be in the margins [0, space_subdivisions)
         """
-        space_subdivisions = 20
-        pos_x = (pos[0] + move[0] + space_subdivisions) % space_subdivisions
-        pos_y = pos[1] + move[1]
-        if not 0 <= pos_y < space_subdivisions:
-            pos_y = pos[1]
+        cell = STEP_CELL[(pos[0] * BOARD_SIZE + pos[1]) * N_OBSERVATIONS + MOVES_TO_OBS[tuple(move)]]
+        pos_x, pos_y = CELL_X[cell], CELL_Y[cell]
         if adv_pos is not None:
             if pos_x == adv_pos[0]:
                 return pos[0], pos_y
 
         return pos_x, pos_y
+
+
+class SearchState(State):
+    """
+    State searched in place. make_move plays an action on the state itself and pushes what it changed on an undo
+    stack, unmake_move takes the last action back. Searching a SearchState allocates no Node and no State.
+    """
+    __slots__ = ("depth", "observations", "trajectories", "undo")
+
+    def __init__(self, node):
+        """
+        :param node: node whose state and observations the search starts from
+        """
+        super().__init__(0)
+        state = node.state
+        self.player = state.player
+        self.scores = state.scores
+        self.caught = state.caught
+        self.hooks = state.hooks
+        self.fish = state.fish
+        self.alive = state.alive
+        self.fish_scores = state.fish_scores
+        self.hash = state.hash
+        # Index of the observations of the next step, as Node.depth
+        self.depth = node.depth
+        self.observations = node.observations
+        self.trajectories = node.trajectories
+        self.undo = []
+
+    @property
+    def state(self):
+        """The state itself, for code written against the NodeCursor interface"""
+        return self
+
+    @property
+    def steps_left(self):
+        """Number of observation steps left until the end of the game"""
+        return len(self.observations) - self.depth
+
+    def legal_moves(self):
+        """
+        Return the actions the current player can play, as Node.legal_moves
+        :return: tuple of integer moves, empty at the end of the game
+        """
+        if len(self.observations) == self.depth:
+            return ()
+        return distinct_moves(self)
+
+    def make_move(self, act):
+        """
+        Play an action
+        :param act: integer of the move
+        :return:
+        """
+        self.undo.append((self.player, self.scores, self.caught, self.hooks, self.fish, self.alive, self.hash))
+        (self.player, self.scores, self.caught, self.hooks, self.fish, self.alive,
+         self.hash) = next_state_fields(self, act, self.trajectories, self.depth + 1)
+        self.depth += 1
+
+    def unmake_move(self):
+        """
+        Take back the last action played
+        :return:
+        """
+        (self.player, self.scores, self.caught, self.hooks, self.fish, self.alive,
+         self.hash) = self.undo.pop()
+        self.depth -= 1
+
+
+class NodeCursor:
+    """
+    Position in a game tree with the interface of SearchState. make_move goes down to a child, computing it
+    if needed, and unmake_move goes back up.
+    """
+
+    def __init__(self, node):
+        """
+        :param node: node the cursor starts from
+        """
+        self.node = node
+        self.path = []
+
+    @property
+    def state(self):
+        """State of the current node"""
+        return self.node.state
+
+    @property
+    def steps_left(self):
+        """Number of observation steps left until the end of the game"""
+        return len(self.node.observations) - self.node.depth
+
+    @property
+    def depth(self):
+        """Index of the observations of the next step of the current node, as SearchState.depth"""
+        return self.node.depth
+
+    @property
+    def trajectories(self):
+        """FishTrajectories of the game tree, as SearchState.trajectories"""
+        return self.node.trajectories
+
+    def legal_moves(self):
+        """
+        Return the moves of the children of the current node, without computing them
+        :return: tuple of integer moves, empty at the end of the game
+        """
+        return self.node.legal_moves()
+
+    def make_move(self, act):
+        """
+        Go down to the child reached with an action, computing only this child if needed
+        :param act: integer of the move
+        :return:
+        """
+        child = self.node.get_child(act)
+        self.path.append(self.node)
+        self.node = child
+
+    def unmake_move(self):
+        """
+        Go back up to the parent of the current node
+        :return:
+        """
+        self.node = self.path.pop()
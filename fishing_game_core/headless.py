@@ -0,0 +1,370 @@
+"""
+Fishing Derby without Kivy.
+
+HeadlessGame plays the game of FishingDerbyMinimaxApp against a player controller running in its own process,
+with the same rules, messages and random draws, but renders nothing and advances one action at a time instead of
+one frame every 1 / frames_per_second seconds. Fishes and hooks move by whole cells at every action, as they do
+at the end of the frames of an action in the app. Boats still move frame by frame, since whether a boat is
+blocked by the other one is checked on their positions at every frame.
+
+Game time is counted in frames, as if the app always kept up with frames_per_second. The next message reaches
+the player as soon as the opponent has answered, while in the app the frames of two actions pass first, so work
+the player does between turns is not hidden anymore.
+"""
+import multiprocessing as mp
+import random
+from time import time
+
+import numpy as np
+
+from fishing_game_core.communicator import Communicator
+from fishing_game_core.game_tree import Node
+from fishing_game_core.messages import MinimaxMessages
+from fishing_game_core.observations import start_resource_tracker
+from fishing_game_core.player_utils import Player
+from fishing_game_core.position_headless import Position
+from fishing_game_core.sequences import Sequences
+from fishing_game_core.shared import SettingLoader, OBS_TO_MOVES, TYPE_TO_SCORE
+
+SPACE_SUBDIVISIONS = 20
+# Seed set by main.Application for the minimax games
+DEFAULT_SEED = 120283473
+
+
+class HeadlessFish:
+    """
+    Fish of widgets.Fish, without its image
+    """
+
+    def __init__(self, init_state, type_fish, name, observations_sequence):
+        self.type_fish = type_fish
+        self.name = name
+        # Unused, but drawn as in widgets.Fish so that the random module is in the same state as in the app
+        self.prev_direction = random.choice(range(8))
+        self.observations_sequence = observations_sequence
+        self.updates_cnt = 0
+        self.position = Position(self, SPACE_SUBDIVISIONS)
+        self.position.set_x(init_state[0])
+        self.position.set_y(init_state[1])
+        self.score = TYPE_TO_SCORE[type_fish]
+        self.caught = None
+
+    def next_movement(self):
+        """
+        Return the move of the fish for the next action and consume its observation
+        :return: 2-tuple (move_x, move_y)
+        """
+        if self.caught is not None:
+            return 0, 0
+        return OBS_TO_MOVES[self.observations_sequence[self.updates_cnt]]
+
+
+class HeadlessHook:
+    def __init__(self, boat, init_hook):
+        self.boat = boat
+        self.position = Position(self, SPACE_SUBDIVISIONS)
+        self.position.set_x(boat.position.x)
+        self.position.set_y(init_hook)
+
+
+class HeadlessBoat:
+    """
+    Boat of widgets.Boat, without its image and line rod
+    """
+
+    def __init__(self, init_state, init_hook):
+        self.position = Position(self, SPACE_SUBDIVISIONS)
+        self.position.set_x(init_state)
+        self.hook = HeadlessHook(self, init_hook)
+        self.has_fish = None
+        self.num_fishes_caught = 0
+
+
+class RandomModel:
+    """
+    Opponent playing random actions, with the interface of opponent.MinimaxModel. For games where the compiled
+    opponent cannot run.
+    """
+
+    def __init__(self, initial_data, space_subdivisions, seed=0):
+        # Own generator, so that the draws of the game are the same as with any other opponent
+        self.random = random.Random(seed)
+
+    def next_move(self, initial_tree_node):
+        """
+        :param initial_tree_node: root node of the opponent
+        :return: either "stay", "left", "right", "up" or "down"
+        """
+        return self.random.choice(["stay", "left", "right", "up", "down"])
+
+
+def minimax_model(initial_data, space_subdivisions):
+    """
+    Create the opponent of the app, opponent.MinimaxModel. Imported here since it is only available on some
+    platforms.
+    """
+    import opponent
+    return opponent.MinimaxModel(initial_data, space_subdivisions)
+
+
+class HeadlessGame(SettingLoader, Communicator, MinimaxMessages):
+    def __init__(self, opponent_model=minimax_model, seed=DEFAULT_SEED):
+        """
+        :param opponent_model: callable (initial_data, space_subdivisions) -> opponent with a next_move method
+        :param seed: seed of the random draws of the game
+        """
+        SettingLoader.__init__(self)
+        Communicator.__init__(self)
+        MinimaxMessages.__init__(self)
+        self.opponent_model = opponent_model
+        self.seed = seed
+        self.minimax_agent_opponent = None
+        self.observations_sequence = None
+        self.fishes = {}
+        self.players = []
+        self.frames = 0  # Number of frames played, as FishingDerbyApp._cnt_steps
+        self.total_time = 0
+        self.current_player = 0
+        self.action = "stay"
+        self.moves = []  # Moves of the fishes for the current action
+        self.game_over = False
+        self.player_loop = None
+        self.time_sent = None
+        self.time_received = None
+        # Time taken by each answer of the player, and search depth, number of re-searches and hit rate of the
+        # evaluation cache it reports if it does
+        self.response_times = []
+        self.search_depths = []
+        self.re_searches = []
+        self.evaluation_cache_hit_rates = []
+
+    def run(self, player_controller):
+        """
+        Play a whole game
+        :param player_controller: PlayerController instance, run in a new process
+        :return: dict of stats, see get_stats
+        """
+        self.start_player(player_controller)
+        try:
+            self.set_seed(self.seed)
+            self.init_game()
+            while self.play_action():
+                pass
+        finally:
+            self.stop_player()
+        return self.get_stats()
+
+    def start_player(self, player_controller):
+        """
+        Start the player loop in a new process connected to the game, as main.Application does
+        :param player_controller: PlayerController instance
+        :return:
+        """
+        game_pipe_send, player_pipe_receive = mp.Pipe()
+        player_pipe_send, game_pipe_receive = mp.Pipe()
+        self.set_receive_send_pipes(game_pipe_receive, game_pipe_send)
+        player_controller.load_settings(self.settings)
+        player_controller.set_receive_send_pipes(player_pipe_receive, player_pipe_send)
+        if self.settings.protocol == "shared_memory":
+            start_resource_tracker()
+        self.player_loop = mp.Process(target=player_controller.player_loop)
+        self.player_loop.start()
+
+    def stop_player(self):
+        """
+        Wait for the player process to end after the game over message, or kill it
+        :return:
+        """
+        self.player_loop.join(1.0)
+        if self.player_loop.is_alive():
+            self.player_loop.terminate()
+            self.player_loop.join()
+        if self.observation_table is not None:
+            self.observation_table.close(unlink=True)
+            self.observation_table = None
+
+    def init_game(self):
+        """
+        Load the observations and create the fishes, the opponent and the boats, in the order of
+        FishingDerbyMinimaxApp.build
+        :return:
+        """
+        self.observations_sequence = Sequences().load(self.settings.observations_file).data
+        self.players = [Player(), Player()]
+        n_seq = self.observations_sequence["params"]["n_seq"]
+        self.total_time = n_seq * 10 * 1.0 / self.settings.frames_per_second
+
+        init_fishes = self.observations_sequence["init_fishes"]
+        for i in range(len(init_fishes)):
+            score = init_fishes[str(i)]["score"]
+            type_fish = None
+            for key, value in TYPE_TO_SCORE.items():
+                if value == score:
+                    type_fish = key
+            name = "fish" + str(i)
+            self.fishes[name] = HeadlessFish(init_fishes[str(i)]["init_pos"], type_fish, name,
+                                             self.observations_sequence["sequence"][str(i)])
+
+        self.send_first_message()
+        initial_data = {}
+        for name, fish in self.fishes.items():
+            initial_data[name] = {"type": fish.type_fish, "score": fish.score}
+        initial_data["game_over"] = False
+        self.minimax_agent_opponent = self.opponent_model(initial_data, SPACE_SUBDIVISIONS)
+
+        init_players = self.observations_sequence["init_players"]
+        for i, player in enumerate(self.players):
+            init_pos = init_players[str(i)]
+            player.boat = HeadlessBoat(init_pos[0], init_pos[1])
+
+        self.fishes_next_move()
+
+    def fishes_next_move(self):
+        """
+        Compute the moves of the fishes for the next action, see FishingDerbyApp.fishes_next_move
+        :return:
+        """
+        self.moves = []
+        for fish in self.fishes.values():
+            self.moves.append(fish.next_movement())
+            fish.updates_cnt += 1
+
+    def play_action(self):
+        """
+        Play the frames of an action, then the end of action updates of FishingDerbyMinimaxApp.update
+        :return: False once the game is over
+        """
+        for fish, (move_x, move_y) in zip(self.fishes.values(), self.moves):
+            if fish.caught is None:
+                fish.position.increase_x(move_x)
+                fish.position.increase_y(move_y)
+        self.execute_action()
+        self.frames += self.settings.frames_per_action
+
+        # Set position of caught fish to position of hook
+        for fish in self.fishes.values():
+            if fish.caught is not None:
+                fish.position.set_y(fish.caught.hook.position.y)
+
+        self.check_fishes_caught()
+        if len(self.fishes) == 0:
+            self.game_over = True
+        # The clock of the app counts whole seconds
+        if self.frames // self.settings.frames_per_second >= self.total_time:
+            self.game_over = True
+
+        self.current_player = 1 - self.current_player
+        msg = {"game_over": self.game_over}
+        if self.game_over:
+            self.sender(msg)
+            return False
+
+        if self.current_player == 0:
+            self.sender(self.build_player_msg(msg))
+            self.time_sent = time()
+            reply = self.receiver()
+            self.time_received = time()
+            self.response_times.append(self.time_received - self.time_sent)
+            if reply.get("search_depth") is not None:
+                self.search_depths.append(reply["search_depth"])
+            if reply.get("re_searches") is not None:
+                self.re_searches.append(reply["re_searches"])
+            if reply.get("evaluation_cache_hit_rate") is not None:
+                self.evaluation_cache_hit_rates.append(reply["evaluation_cache_hit_rate"])
+            self.check_time_threshold()
+            self.action = reply["action"]
+        else:
+            initial_tree_node = Node(message=self.build_minimax_msg(msg), player=1)
+            self.action = self.minimax_agent_opponent.next_move(initial_tree_node)
+
+        self.fishes_next_move()
+        return True
+
+    def execute_action(self):
+        """
+        Move the boat of the current player during the frames of an action, see FishingDerby.act
+        :return:
+        """
+        boat = self.players[self.current_player].boat
+        action = "up" if boat.has_fish else self.action
+        if action == "up":
+            boat.hook.position.increase_y(1)
+        elif action == "down":
+            boat.hook.position.increase_y(-1)
+        elif action in ("left", "right"):
+            speed = (1.0 if action == "right" else -1.0) / self.settings.frames_per_action
+            adv_boat = self.players[1 - self.current_player].boat
+            for _ in range(self.settings.frames_per_action):
+                self.move_boat(boat, speed, adv_boat)
+
+    @staticmethod
+    def move_boat(boat, speed, adv_boat):
+        """
+        Move a boat by a frame unless it gets too close to the other boat, as FishingDerby.move_boat
+        :return:
+        """
+        slack = 1.0 / SPACE_SUBDIVISIONS
+        next_boat_x = (boat.position.pos_x + speed / SPACE_SUBDIVISIONS) % 1
+        if abs(next_boat_x - adv_boat.position.pos_x) >= slack:
+            boat.hook.position.increase_x(speed)
+            boat.position.increase_x(speed)
+
+    def check_fishes_caught(self):
+        """
+        Hook the fishes on the same cell as a free hook and pull in the hooked fishes at the surface, see
+        FishingDerbyApp.check_fishes_caught
+        :return:
+        """
+        for player_number, player in enumerate(self.players):
+            boat = player.boat
+            if boat.has_fish is None:
+                fish_near = self.check_fish_near(boat)
+                if fish_near is not None:
+                    boat.has_fish = fish_near
+                    fish_near.caught = boat
+
+            if boat.has_fish is not None and boat.hook.position.y == 19:
+                self.finish_pulling_fish(player_number)
+
+    def check_fish_near(self, boat):
+        """
+        Catch a random fish that is on the same position as the boat if possible, drawn as in
+        FishingDerbyApp.check_fish_near
+        :param boat: HeadlessBoat. It must not have a caught fish.
+        :return: HeadlessFish or None
+        """
+        indices = np.random.permutation(len(self.fishes))
+        keys = list(self.fishes.keys())
+        for f in indices:
+            fish = self.fishes[keys[f]]
+            if fish.position == boat.hook.position and fish.caught is None:
+                return fish
+
+    def finish_pulling_fish(self, player_number):
+        player = self.players[player_number]
+        boat = player.boat
+        player.score += boat.has_fish.score
+        del self.fishes[boat.has_fish.name]
+        boat.has_fish = None
+        boat.num_fishes_caught += 1
+
+    def get_stats(self):
+        """
+        Return the results of the game
+        :return: dict
+        """
+        return {"score_p0": self.players[0].score,
+                "score_p1": self.players[1].score,
+                "num_fishes_caught_p0": self.players[0].boat.num_fishes_caught,
+                "num_fishes_caught_p1": self.players[1].boat.num_fishes_caught,
+                "steps": self.frames // self.settings.frames_per_action,
+                "response_times": self.response_times,
+                "search_depths": self.search_depths,
+                "re_searches": self.re_searches,
+                "evaluation_cache_hit_rates": self.evaluation_cache_hit_rates,
+                "timeouts": sum(t > self.settings.time_threshold for t in self.response_times)}
+
+    @staticmethod
+    def set_seed(seed):
+        random.seed(seed)
+        np.random.seed(seed)
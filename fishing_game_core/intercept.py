@@ -0,0 +1,147 @@
+"""
+Time for the hooks to intercept the fish, computed over their known trajectories at the root of a search.
+
+The free fish do not react to the hooks, so from the root of a search the position of every one of them is known at
+every later step. For each hook, InterceptTables computes the number of its own moves it needs to meet every fish,
+from every cell, at every ply of a horizon: a dynamic programming pass backwards from the horizon, where the hook
+meets a fish if they share a cell after a ply, and otherwise goes to the best of the neighbouring cells on the plies
+of its player and waits on the plies of the other one. At the horizon, the wrapped distance to the fish stands in
+for the rest of its trajectory. Every cell and every fish of a ply are computed at once with NumPy.
+
+Unlike the distance to where a fish is now, this time follows the fish: a fish swimming towards the hook is reached
+sooner than its distance, one swimming away later. It ignores the other hook, which can block a column or catch the
+fish first, and the fish the search removes or puts on a rod.
+
+The tables are kept from one search to the next as long as the game stays in the same game tree and far enough
+from their horizon, see InterceptTables.reusable. The player stays in the same game tree when it finds the new
+root in the previous one, see PlayerControllerMinimax.reroot, in both search modes. The search workers build a
+new game tree from the message of every job, so they compute new tables every turn. The value the tables give to
+a state depends on its step, so the evaluation cache keys its values by step too, and is cleared whenever the
+tables are computed again.
+"""
+import math
+
+import numpy as np
+
+from fishing_game_core.tables import BOARD_SIZE, N_ACTIONS, N_CELLS, NEXT_HOOK_CELL, WRAPPED_DISTANCE
+
+# Number of plies after the root covered by the tables
+INTERCEPT_HORIZON = 64
+# Plies the tables must still cover after the root of a search to be kept for it, beyond the depth the search
+# usually reaches
+INTERCEPT_MARGIN = 32
+
+# WRAPPED_DISTANCE as an array of shape (N_CELLS, N_CELLS), without copy
+_WRAPPED_DISTANCE_ARRAY = np.frombuffer(WRAPPED_DISTANCE, dtype=np.int8).reshape(N_CELLS, N_CELLS)
+# _EXP_NEG[moves]: exp(-moves), with the values of EXP_NEG_WRAPPED_DISTANCE
+_EXP_NEG_LIST = [math.exp(-d) for d in range(256)]
+_EXP_NEG = np.array(_EXP_NEG_LIST)
+
+
+def intercept_moves(fish_cells, moving):
+    """
+    Compute the number of moves a hook needs to meet every fish, from every cell, at every ply
+    :param fish_cells: integer array of shape (plies, fish), cell x * BOARD_SIZE + y of every fish after every ply
+        from the root
+    :param moving: sequence of booleans, whether the hook moves on the ply from the row of fish_cells to the next
+    :return: array of shape (plies, fish, N_CELLS)
+    """
+    n_plies, n_fish = fish_cells.shape
+    moves = np.empty((n_plies, n_fish, N_CELLS), dtype=np.int16)
+    fish_index = np.arange(n_fish)
+    moves[-1] = _WRAPPED_DISTANCE_ARRAY[fish_cells[-1]]
+    for ply in range(n_plies - 2, -1, -1):
+        if moving[ply]:
+            # Best of the cell and of its neighbours, wrapped along x and not beyond the borders along y
+            grid = moves[ply + 1].reshape(n_fish, BOARD_SIZE, BOARD_SIZE)
+            best = moves[ply].reshape(n_fish, BOARD_SIZE, BOARD_SIZE)
+            np.minimum(grid[:, 1:], grid[:, :-1], out=best[:, 1:])
+            np.minimum(grid[:, 0], grid[:, -1], out=best[:, 0])
+            np.minimum(best[:, :-1], grid[:, 1:], out=best[:, :-1])
+            np.minimum(best[:, -1], grid[:, 0], out=best[:, -1])
+            np.minimum(best[:, :, :-1], grid[:, :, 1:], out=best[:, :, :-1])
+            np.minimum(best[:, :, 1:], grid[:, :, :-1], out=best[:, :, 1:])
+            best += 1
+        else:
+            moves[ply] = moves[ply + 1]
+        moves[ply, fish_index, fish_cells[ply]] = 0
+    return moves
+
+
+class InterceptTables:
+    """
+    Moves of both hooks to the free fish of a root state, and the best fish within reach of every cell, for the
+    plies from the root to the horizon
+    """
+
+    def __init__(self, trajectories, step, player, fish_scores, horizon=INTERCEPT_HORIZON):
+        """
+        :param trajectories: FishTrajectories of the game tree
+        :param step: index in the trajectories of the root of the search
+        :param player: player to move at the root
+        :param fish_scores: dict from fish number to score
+        :param horizon: number of plies after the root
+        """
+        self.trajectories = trajectories
+        self.step = step
+        self.horizon = max(0, min(horizon, trajectories.steps - step))
+        self.fish_numbers = trajectories.fish_numbers
+        trajectories.extend(step + self.horizon + 1)
+        positions = trajectories.positions[step:step + self.horizon + 1]
+        fish_cells = positions[:, :, 0] * BOARD_SIZE + positions[:, :, 1]
+        self.scores = np.array([fish_scores[n] for n in self.fish_numbers], dtype=float)
+        # moves[p][ply, i, cell]: moves of the hook of player p in cell after ply to meet fish self.fish_numbers[i]
+        self.moves = [intercept_moves(fish_cells, [(player + ply) % 2 == p for ply in range(self.horizon + 1)])
+                      for p in range(2)]
+        # best[p][ply][cell]: maximum of score * exp(-moves) over the fish, 0 without fish, computed when first read
+        self.best = ({}, {})
+        self.steps_left = trajectories.steps - step
+
+    def covers(self, trajectories, step):
+        """
+        :param trajectories: FishTrajectories of a game tree
+        :param step: index in the trajectories
+        :return: whether the tables hold the fish of that step
+        """
+        return trajectories is self.trajectories and self.step <= step <= self.step + self.horizon
+
+    def reusable(self, trajectories, step):
+        """
+        :param trajectories: FishTrajectories of the game tree of a search
+        :param step: index in the trajectories of the root of the search
+        :return: whether the tables can serve that search instead of new ones
+        """
+        return self.covers(trajectories, min(step + INTERCEPT_MARGIN, trajectories.steps))
+
+    def terms(self, step, cell, fish_scores):
+        """
+        :param step: index in the trajectories, covered by the tables
+        :param cell: x * BOARD_SIZE + y of the hook of player 0
+        :param fish_scores: dict from fish number to score
+        :return: list of (score * exp(-moves), fish number) of the free fish of the root
+        """
+        moves = self.moves[0][step - self.step, :, cell].tolist()
+        return [(fish_scores[n] * _EXP_NEG_LIST[m], n) for m, n in zip(moves, self.fish_numbers)]
+
+    def move_values(self, player, steps_left, hooks, moves):
+        """
+        Return the best fish within reach of the cell every move of a player leads to
+        :param player: player to move
+        :param steps_left: number of observation steps left from the position
+        :param hooks: hook positions of the position, see State.hooks
+        :param moves: legal moves of the player
+        :return: dict from move to value, or None if the tables do not reach the next ply
+        """
+        ply = self.steps_left - steps_left + 1
+        if not 0 < ply <= self.horizon:
+            return None
+        best = self.best[player].get(ply)
+        if best is None:
+            if self.fish_numbers:
+                values = (self.scores[:, None] * _EXP_NEG[self.moves[player][ply]]).max(axis=0)
+                best = self.best[player][ply] = values.tolist()
+            else:
+                best = self.best[player][ply] = [0.0] * N_CELLS
+        base = (hooks[2 * player] * BOARD_SIZE + hooks[2 * player + 1]) * N_ACTIONS
+        other_x = hooks[2 * (1 - player)]
+        return {move: best[NEXT_HOOK_CELL[(base + move) * BOARD_SIZE + other_x]] for move in moves}
@@ -0,0 +1,103 @@
+"""
+Messages sent by the minimax games to the player, shared by the Kivy app (app.py) and the headless game
+(headless.py). The games provide self.settings, self.fishes, self.players, self.sender, self.time_sent and
+self.time_received.
+"""
+from fishing_game_core.observations import ObservationTable, shared_memory
+
+
+class MinimaxMessages:
+    def __init__(self):
+        self.n_timeouts = 0
+        self.observation_table = None  # Observations shared with the player with the shared_memory protocol
+
+    def send_first_message(self):
+        msg = {}
+        for name, fish in self.fishes.items():
+            msg[name] = {"type": fish.type_fish, "score": fish.score}
+        msg["game_over"] = False
+        if self.settings.protocol in ("delta", "shared_memory"):
+            # The observation sequences are only sent once, see build_delta_msg
+            observations = {}
+            msg["fish_scores"] = {}
+            for name, fish in self.fishes.items():
+                n = int(name[4:])
+                observations[n] = fish.observations_sequence
+                msg["fish_scores"][n] = fish.score
+            if self.settings.protocol == "shared_memory" and shared_memory is not None:
+                self.observation_table = ObservationTable(observations, msg["fish_scores"])
+                msg["observations_memory"] = self.observation_table.share()
+            else:
+                msg["observations"] = observations
+        self.sender(msg)
+
+    def build_minimax_msg(self, msg):
+        msg = self.build_delta_msg(msg)
+        msg["observations"] = {}
+        msg["fish_scores"] = {}
+
+        for k, fish in self.fishes.items():
+            n = int(k[4:])
+            st = fish.updates_cnt
+            msg["observations"][n] = fish.observations_sequence[st:]
+            msg["fish_scores"][n] = fish.score
+
+        return msg
+
+    def build_delta_msg(self, msg):
+        """
+        Add the state of the game to a message of the delta protocol: the number of observations played and the
+        positions, catches and scores, without the observations and fish scores sent in the first message
+        :param msg: dict
+        :return: the same dict
+        """
+        msg["hooks_positions"] = {}
+        msg["fishes_positions"] = {}
+
+        for i, player in enumerate(self.players):
+            boat = player.boat
+            msg["hooks_positions"][i] = (
+                boat.hook.position.x, boat.hook.position.y)
+
+        msg["step"] = 0
+        for k, fish in self.fishes.items():
+            n = int(k[4:])
+            msg["fishes_positions"][n] = (fish.position.x, fish.position.y)
+            msg["step"] = fish.updates_cnt
+
+        caught_fish_names = {0: None,
+                             1: None}
+
+        for p in range(len(self.players)):
+            if self.players[p].boat.has_fish is not None:
+                caught_fish_names[p] = int(
+                    self.players[p].boat.has_fish.name[4:])
+
+        msg["player_scores"] = {}
+        msg["player_scores"][0] = self.players[0].score
+        msg["player_scores"][1] = self.players[1].score
+
+        msg["caught_fish"] = caught_fish_names
+        return msg
+
+    def build_player_msg(self, msg):
+        """
+        Add the state of the game to a message for the player, in the protocol set in the settings, and the time
+        it took to answer the previous one
+        :param msg: dict
+        :return: the same dict
+        """
+        if self.time_sent is not None and self.time_received is not None:
+            # Echoed so that the player can learn how long a turn takes out of its search
+            msg["response_time"] = self.time_received - self.time_sent
+        if self.settings.protocol in ("delta", "shared_memory"):
+            return self.build_delta_msg(msg)
+        return self.build_minimax_msg(msg)
+
+    def check_time_threshold(self):
+        if self.time_received - self.time_sent > self.settings.time_threshold:
+            self.n_timeouts += 1
+            if self.n_timeouts >= 3:
+                raise TimeoutError
+        else:
+            self.n_timeouts = 0
@@ -0,0 +1,158 @@
+"""
+Observation sequences of a game, for the delta protocol between the game and the player.
+
+With the "full" protocol, every message sent to the player holds the remaining observations of every fish. With
+the "delta" protocol, the first message holds the whole sequences and the fish scores, which never change during
+a game, and the following ones only the step reached and the state of the hooks, fishes and players. The player
+keeps the sequences in an ObservationTable and completes every message with it. The "shared_memory" protocol
+works as the delta one, except that the game copies the sequences once to a shared memory block and the first
+message only describes it, so the player reads them without any copy.
+"""
+import os
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+def start_resource_tracker():
+    """
+    Start the process that frees the shared memory blocks left by this process, before starting the processes
+    that attach to them. They then use the same one. Otherwise each of them would start its own, which would free
+    the blocks it attached to when it ends.
+    :return:
+    """
+    if shared_memory is not None and os.name == "posix":
+        resource_tracker.ensure_running()
+
+
+class ObservationSteps:
+    """
+    Observations left from a step, for the fishes still in the game. Behaves as the observations field of Node, a
+    mapping from the steps left to the list of observations of the fishes, without building those lists upfront.
+    """
+
+    def __init__(self, codes):
+        """
+        :param codes: NumPy array of observation codes of shape (fish, steps), fishes in increasing number order
+        """
+        self.codes = codes
+
+    def __len__(self):
+        return self.codes.shape[1]
+
+    def __getitem__(self, step):
+        """
+        Return the observations of a step
+        :param step: integer in [0, len(self))
+        :return: list of observation codes, one per fish
+        """
+        if not 0 <= step < self.codes.shape[1]:
+            raise KeyError(step)
+        return self.codes[:, step].tolist()
+
+
+class ObservationTable:
+    """
+    Observation sequences of every fish of a game, from its first step
+    """
+
+    def __init__(self, sequences, fish_scores):
+        """
+        :param sequences: dict of fish_number -> list of observation codes of the whole game
+        :param fish_scores: dict of fish_number -> score
+        """
+        fish_numbers = sorted(sequences)
+        self.rows = {n: i for i, n in enumerate(fish_numbers)}
+        self.codes = np.array([sequences[n] for n in fish_numbers], dtype=np.int8)
+        self.fish_scores = dict(fish_scores)
+        # Shared memory block holding self.codes, see share and attach
+        self.shared_memory = None
+
+    @classmethod
+    def from_first_message(cls, msg):
+        """
+        Build the table of a game from the first message the game sends
+        :param msg: dict. First message, see FishingDerbyMinimaxApp.send_first_message
+        :return: ObservationTable, or None if the game uses the full protocol
+        """
+        if "observations_memory" in msg:
+            return cls.attach(msg["observations_memory"], msg["fish_scores"])
+        if "observations" not in msg:
+            return None
+        return cls(msg["observations"], msg["fish_scores"])
+
+    @classmethod
+    def attach(cls, description, fish_scores):
+        """
+        Build a table reading the codes of the shared memory block of another table. Nothing is copied. The process
+        must share the resource tracker of the creator of the block, see start_resource_tracker.
+        :param description: dict returned by the share method of the other table
+        :param fish_scores: dict of fish_number -> score
+        :return: ObservationTable
+        """
+        block = shared_memory.SharedMemory(name=description["name"])
+        table = cls.__new__(cls)
+        table.rows = {n: i for i, n in enumerate(description["fish_numbers"])}
+        table.codes = np.ndarray(description["shape"], dtype=np.int8, buffer=block.buf)
+        table.fish_scores = dict(fish_scores)
+        table.shared_memory = block
+        return table
+
+    def share(self):
+        """
+        Move the codes to a new shared memory block, that other processes can attach to
+        :return: dict describing the block, for attach
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(1, self.codes.nbytes))
+        codes = np.ndarray(self.codes.shape, dtype=np.int8, buffer=block.buf)
+        codes[:] = self.codes
+        self.codes = codes
+        self.shared_memory = block
+        return {"name": block.name,
+                "shape": codes.shape,
+                "fish_numbers": sorted(self.rows, key=self.rows.get)}
+
+    def close(self, unlink=False):
+        """
+        Stop using the shared memory block of the table. The observations returned by remaining must not be used
+        anymore.
+        :param unlink: whether to also free the block, which only its creator should do
+        :return:
+        """
+        if self.shared_memory is None:
+            return
+        self.codes = None
+        self.shared_memory.close()
+        if unlink:
+            self.shared_memory.unlink()
+        self.shared_memory = None
+
+    def remaining(self, step, fish_numbers):
+        """
+        Return the observations left from a step. As long as no fish was removed, they are a view of the table.
+        :param step: number of observations already played
+        :param fish_numbers: numbers of the fishes still in the game
+        :return: ObservationSteps
+        """
+        rows = [self.rows[n] for n in sorted(fish_numbers)]
+        first = rows[0] if rows else 0
+        if rows == list(range(first, first + len(rows))):
+            # Slicing gives a view, indexing with a list a copy
+            return ObservationSteps(self.codes[first:first + len(rows), step:])
+        return ObservationSteps(self.codes[rows, step:])
+
+    def complete_message(self, msg):
+        """
+        Add the observations and fish scores to a message of the delta protocol, so that it can be given to Node
+        :param msg: dict. Message from FishingDerbyMinimaxApp.build_delta_msg
+        :return: the same dict
+        """
+        if "step" in msg and "observations" not in msg:
+            fish_numbers = msg["fishes_positions"].keys()
+            msg["observations"] = self.remaining(msg["step"], fish_numbers)
+            msg["fish_scores"] = {n: self.fish_scores[n] for n in fish_numbers}
+        return msg
@@ -0,0 +1,103 @@
+"""
+Move ordering learnt from the cutoffs of the search, instead of evaluating every child of a node before searching
+it.
+
+Moves are tried in this order: the best move stored in the transposition table, the two killer moves of the step,
+the countermove of the move that led to the node, then the other moves by decreasing history score. Killer moves
+are the last two moves that caused a cutoff at the same step of the game, whatever the position, and are keyed by
+the number of steps left so that they stay valid from one turn to the next. The history score of a move is indexed
+by the player, the move and the cell of the hook of the player, and grows with the depth of the cutoffs the move
+causes. The countermove of a move is the last move that refuted it. All the tables are kept from one iteration and
+one turn to the next.
+
+With intercept tables, the moves after the countermove are sorted by the best fish within reach of the cell they
+lead to instead, and by history score only when they tie, see fishing_game_core.intercept.
+
+The moves that no table tells apart keep the order of the legal moves, unless a move bias is set: the processes
+of a parallel search each break those ties in their own order, so that they do not all search the same nodes.
+"""
+from fishing_game_core.tables import BOARD_SIZE, N_CELLS
+
+N_MOVES = 5
+
+# Sort keys of the moves, above any history score
+TT_MOVE_SCORE = 1 << 62
+KILLER_SCORES = (1 << 61, 1 << 60)
+COUNTERMOVE_SCORE = 1 << 59
+
+
+class MoveOrdering:
+    def __init__(self):
+        # steps_left -> list of at most two moves, the most recent first
+        self.killers = {}
+        # Indexed by (player * N_MOVES + move) * N_CELLS + hook cell, cells numbered x * BOARD_SIZE + y
+        self.history = [0] * (2 * N_MOVES * N_CELLS)
+        # countermoves[player][previous move] -> move of player, or None
+        self.countermoves = [[None] * N_MOVES for _ in range(2)]
+        # Score added to every move, below any history increment, to break the ties
+        self.move_bias = (0,) * N_MOVES
+        # InterceptTables of the search sorting the moves before the history scores, or None
+        self.intercepts = None
+
+    def new_search(self, steps_left):
+        """
+        Prepare the tables for the search of a new turn: drop the killer moves of the steps already played and halve
+        the history scores, so that recent cutoffs weigh more
+        :param steps_left: number of observation steps left at the root of the search
+        :return:
+        """
+        self.killers = {k: v for k, v in self.killers.items() if k <= steps_left}
+        self.history = [score >> 1 for score in self.history]
+
+    def order(self, moves, tt_move, state, steps_left, previous_move):
+        """
+        Sort the moves of a position
+        :param moves: tuple of legal moves
+        :param tt_move: best move of the position in the transposition table, or None
+        :param state: State or SearchState of the position
+        :param steps_left: number of observation steps left from the position
+        :param previous_move: move that led to the position, or None
+        :return: list of moves, the most promising first
+        """
+        if len(moves) == 1:
+            return list(moves)
+        player = state.player
+        cell = state.hooks[2 * player] * BOARD_SIZE + state.hooks[2 * player + 1]
+        history, bias = self.history, self.move_bias
+        scores = {move: (history[(player * N_MOVES + move) * N_CELLS + cell] << 3) + bias[move] for move in moves}
+        if previous_move is not None:
+            countermove = self.countermoves[player][previous_move]
+            if countermove in scores:
+                scores[countermove] += COUNTERMOVE_SCORE
+        for killer, killer_score in zip(self.killers.get(steps_left, ()), KILLER_SCORES):
+            if killer in scores:
+                scores[killer] += killer_score
+        if tt_move in scores:
+            scores[tt_move] += TT_MOVE_SCORE
+        values = None
+        if self.intercepts is not None:
+            values = self.intercepts.move_values(player, steps_left, state.hooks, moves)
+        if values is None:
+            return sorted(moves, key=scores.__getitem__, reverse=True)
+        return sorted(moves, key=lambda move: (scores[move] // COUNTERMOVE_SCORE, values[move], scores[move]),
+                      reverse=True)
+
+    def record_cutoff(self, move, depth, state, steps_left, previous_move):
+        """
+        Record a move that caused a cutoff
+        :param move: the move
+        :param depth: depth left of the search at the position
+        :param state: State or SearchState of the position, before the move
+        :param steps_left: number of observation steps left from the position
+        :param previous_move: move that led to the position, or None
+        :return:
+        """
+        player = state.player
+        cell = state.hooks[2 * player] * BOARD_SIZE + state.hooks[2 * player + 1]
+        self.history[(player * N_MOVES + move) * N_CELLS + cell] += depth * depth
+        killers = self.killers.setdefault(steps_left, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        if previous_move is not None:
+            self.countermoves[player][previous_move] = move
@@ -70,3 +70,12 @@ class SettingLoader:
 
     def load_settings(self, settings):
         self.settings = settings
+
+    def get_setting(self, name, default=None):
+        """
+        Return a setting, or a default value if no settings are loaded or they do not define it
+        :param name: name of the setting
+        :param default: value returned when the setting is not available
+        :return:
+        """
+        return getattr(self.settings, name, default)
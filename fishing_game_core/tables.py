@@ -0,0 +1,107 @@
+"""
+Lookup tables of the moves of the hooks and the fish, and of the distances on the board.
+
+Cells are numbered x * BOARD_SIZE + y, as in the zobrist keys. Every table is a flat sequence indexed by an offset
+computed from its arguments, as documented with the table. They are built once, with NumPy, when the module is first
+imported, so that the search reads a table entry instead of redoing the modular arithmetic and the checks of the
+borders and of the other hook. The tables of distances are arrays of bytes, the others tuples, which are faster to
+index.
+"""
+import math
+from array import array
+
+import numpy as np
+
+from fishing_game_core.shared import ACT_TO_MOVES, OBS_TO_MOVES
+
+BOARD_SIZE = 20
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+N_ACTIONS = len(ACT_TO_MOVES)
+N_OBSERVATIONS = len(OBS_TO_MOVES)
+
+_CELLS = np.arange(N_CELLS)
+_X, _Y = _CELLS // BOARD_SIZE, _CELLS % BOARD_SIZE
+
+# CELL_X[cell], CELL_Y[cell]: coordinates of a cell
+CELL_X = tuple(_X.tolist())
+CELL_Y = tuple(_Y.tolist())
+
+
+def _step(move_x, move_y):
+    """
+    :return: (x, y) arrays of the cells reached from every cell by a move, wrapping along x and staying in place
+        along y at the borders
+    """
+    x = (_X + move_x) % BOARD_SIZE
+    y = _Y + move_y
+    return x, np.where((y < 0) | (y >= BOARD_SIZE), _Y, y)
+
+
+def _build_step_cells():
+    """
+    :return: STEP_CELL, indexed by cell * N_OBSERVATIONS + observation code
+    """
+    table = np.empty((N_CELLS, N_OBSERVATIONS), dtype=np.int64)
+    for code, (move_x, move_y) in OBS_TO_MOVES.items():
+        x, y = _step(move_x, move_y)
+        table[:, code] = x * BOARD_SIZE + y
+    return tuple(table.ravel().tolist())
+
+
+def _build_hook_cells():
+    """
+    :return: NEXT_HOOK_CELL, indexed by (cell * N_ACTIONS + action) * BOARD_SIZE + x of the other hook
+    """
+    table = np.empty((N_CELLS, N_ACTIONS, BOARD_SIZE), dtype=np.int64)
+    other_x = np.arange(BOARD_SIZE)
+    for act, (move_x, move_y) in ACT_TO_MOVES.items():
+        x, y = _step(move_x, move_y)
+        # A hook cannot enter the column of the other hook, it then only moves along y
+        blocked = x[:, None] == other_x[None, :]
+        table[:, act, :] = np.where(blocked, _X[:, None], x[:, None]) * BOARD_SIZE + y[:, None]
+    return tuple(table.ravel().tolist())
+
+
+def _build_distances():
+    """
+    :return: (WRAPPED_DISTANCE, BLOCKED_DISTANCE) as NumPy arrays, see below
+    """
+    dx = np.abs(_X[:, None] - _X[None, :])
+    dy = np.abs(_Y[:, None] - _Y[None, :])
+    wrapped = np.minimum(dx, BOARD_SIZE - dx) + dy
+
+    # Going straight is blocked by another hook strictly between the two columns, going around the board by one
+    # strictly outside of them. A hook is never in the column of the other one, so at most one way is blocked.
+    low = np.minimum(_X[:, None], _X[None, :])[:, :, None]
+    high = np.maximum(_X[:, None], _X[None, :])[:, :, None]
+    other_x = np.arange(BOARD_SIZE)[None, None, :]
+    straight = np.where((low < other_x) & (other_x < high), 2 * BOARD_SIZE, dx[:, :, None])
+    around = np.where((other_x < low) | (high < other_x), 2 * BOARD_SIZE, (BOARD_SIZE - dx)[:, :, None])
+    blocked = np.where(dx[:, :, None] == 0, 0, np.minimum(straight, around)) + dy[:, :, None]
+    return wrapped, blocked
+
+
+# STEP_CELL[cell * N_OBSERVATIONS + code]: cell reached from cell with the move of an observation code of OBS_TO_MOVES,
+# read by Node.xy_move for the fish and the hooks
+STEP_CELL = _build_step_cells()
+# NEXT_HOOK_CELL[(cell * N_ACTIONS + action) * BOARD_SIZE + other_x]: cell reached by a hook from cell with an
+# action of ACT_TO_MOVES when the other hook is in column other_x. The same cell when the action does not move it.
+NEXT_HOOK_CELL = _build_hook_cells()
+# DISTINCT_MOVES[cell * BOARD_SIZE + other_x]: actions of a hook in cell leading to different cells, "stay" first
+DISTINCT_MOVES = tuple(
+    tuple(act for act in range(N_ACTIONS)
+          if act == 0 or NEXT_HOOK_CELL[(cell * N_ACTIONS + act) * BOARD_SIZE + other_x] != cell)
+    for cell in range(N_CELLS) for other_x in range(BOARD_SIZE))
+
+_WRAPPED, _BLOCKED = _build_distances()
+# WRAPPED_DISTANCE[hook_cell * N_CELLS + cell]: Manhattan distance with the x axis wrapped around the board
+WRAPPED_DISTANCE = array('b', _WRAPPED.astype(np.int8).ravel().tobytes())
+# EXP_NEG_WRAPPED_DISTANCE[hook_cell * N_CELLS + cell]: exp(-WRAPPED_DISTANCE[hook_cell * N_CELLS + cell])
+_EXP_NEG = [math.exp(-d) for d in range(int(_WRAPPED.max()) + 1)]
+EXP_NEG_WRAPPED_DISTANCE = tuple(_EXP_NEG[d] for d in WRAPPED_DISTANCE)
+# The same table as a NumPy array of shape (N_CELLS, N_CELLS), for the vectorised evaluation
+EXP_NEG_WRAPPED_DISTANCE_ARRAY = np.array(EXP_NEG_WRAPPED_DISTANCE).reshape(N_CELLS, N_CELLS)
+# BLOCKED_DISTANCE[(hook_cell * N_CELLS + cell) * BOARD_SIZE + other_x]: number of moves of a hook to a cell when the
+# other hook is in column other_x, going around the board if the other hook is in the way
+BLOCKED_DISTANCE = array('b', _BLOCKED.astype(np.int8).ravel().tobytes())
+del _WRAPPED, _BLOCKED, _EXP_NEG
@@ -0,0 +1,326 @@
+"""
+Transposition table for the minimax search.
+
+Entries are stored in two fixed-size tiers indexed by the low bits of the zobrist key: a depth-preferred tier,
+which keeps the deepest result seen for a slot during the current search, and an always-replace tier, which
+keeps the most recent one. The memory used by the table never grows after it is created.
+
+SharedTranspositionTable keeps the same tiers in a shared memory block, so that the processes of a parallel
+search all read and write one table. It takes no lock: every entry is stored as three 64-bit words, and the key
+word is stored xored with the two others, so that an entry torn by two processes writing at once no longer
+matches its key and reads as missing.
+"""
+import sys
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# Kind of bound stored with a value
+EXACT = 0  # value is the minimax value of the position
+LOWER = 1  # value is a lower bound (the search failed high)
+UPPER = 2  # value is an upper bound (the search failed low)
+
+DEFAULT_ENTRIES = 1 << 17
+
+# Approximate memory taken by one entry: the slot pointer, the entry tuple and its key and value objects
+ENTRY_BYTES = (8 + sys.getsizeof((0, 0, 0, 0.0, 0, 0)) + sys.getsizeof(1 << 63) + sys.getsizeof(0.0))
+
+
+class TranspositionTable:
+    def __init__(self, max_entries=DEFAULT_ENTRIES, max_bytes=None):
+        """
+        :param max_entries: maximum number of entries held by the table
+        :param max_bytes: approximate maximum memory taken by the table. Whichever limit is lower applies.
+        """
+        if max_bytes is not None:
+            max_entries = min(max_entries, max_bytes // ENTRY_BYTES)
+        # Number of slots per tier, the largest power of two not above max_entries / 2
+        n_slots = 1 << max(0, (max_entries // 2).bit_length() - 1)
+        self.mask = n_slots - 1
+        # Entries are tuples (key, depth, flag, value, move, generation)
+        self.depth_preferred = [None] * n_slots
+        self.always_replace = [None] * n_slots
+        # Incremented at every new search. Entries of older searches can always be replaced.
+        self.generation = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def new_search(self):
+        """
+        Mark the entries stored so far as belonging to a previous search
+        :return:
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Look up the entry of a position
+        :param key: zobrist key of the position
+        :return: tuple (key, depth, flag, value, move, generation) or None if the position is not stored
+        """
+        self.probes += 1
+        slot = key & self.mask
+        entry = self.depth_preferred[slot]
+        if entry is None or entry[0] != key:
+            entry = self.always_replace[slot]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, move):
+        """
+        Store the result of a search
+        :param key: zobrist key of the position
+        :param depth: remaining depth searched below the position
+        :param flag: EXACT, LOWER or UPPER
+        :param value: value found by the search
+        :param move: best move found by the search
+        :return:
+        """
+        self.stores += 1
+        slot = key & self.mask
+        entry = (key, depth, flag, value, move, self.generation)
+        deepest = self.depth_preferred[slot]
+        if deepest is None or deepest[1] <= depth or deepest[5] != self.generation:
+            self.depth_preferred[slot] = entry
+            if deepest is None or deepest[0] == key:
+                return
+            # The replaced entry is still worth keeping until something newer needs the slot
+            entry = deepest
+
+        replaced = self.always_replace[slot]
+        if replaced is not None and replaced[0] != key and replaced[0] != entry[0]:
+            self.evictions += 1
+        self.always_replace[slot] = entry
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters
+        :return:
+        """
+        n_slots = self.mask + 1
+        self.depth_preferred = [None] * n_slots
+        self.always_replace = [None] * n_slots
+        self.probes = self.hits = self.stores = self.evictions = 0
+
+    @property
+    def capacity(self):
+        """Maximum number of entries held by the table"""
+        return 2 * (self.mask + 1)
+
+    @property
+    def hit_rate(self):
+        """Fraction of the probes that found their position"""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """
+        Return the counters of the table
+        :return: dict
+        """
+        return {"capacity": self.capacity,
+                "probes": self.probes,
+                "hits": self.hits,
+                "hit_rate": self.hit_rate,
+                "stores": self.stores,
+                "evictions": self.evictions}
+
+
+# Bytes of a SharedTranspositionTable entry: checked key, packed data and value words
+SHARED_ENTRY_BYTES = 24
+# Packing of the data word of a SharedTranspositionTable entry
+_OCCUPIED = 1 << 48
+
+
+class SharedTranspositionTable:
+    """
+    TranspositionTable held in a shared memory block, with the same interface. Entries are read as
+    (key, depth, flag, value, move, generation) tuples but stored as three words per entry: the data word packs
+    depth (8 bits), flag (2 bits), move (3 bits) and generation (16 bits), the value word holds the value and the
+    key word holds key ^ data ^ value bits. The generation is shared too: new_search in any process starts a new
+    search for all of them.
+    """
+
+    def __init__(self, max_entries=DEFAULT_ENTRIES, max_bytes=None, name=None):
+        """
+        :param max_entries: maximum number of entries held by the table
+        :param max_bytes: approximate maximum memory taken by the table. Whichever limit is lower applies.
+        :param name: name of the block of an existing table to attach to, see share. None creates a new block.
+        """
+        if max_bytes is not None:
+            max_entries = min(max_entries, max_bytes // SHARED_ENTRY_BYTES)
+        n_slots = 1 << max(0, (max_entries // 2).bit_length() - 1)
+        self.mask = n_slots - 1
+        n_entries = 2 * n_slots
+        if name is None:
+            # Zero filled, so every entry starts unoccupied
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=8 + n_entries * SHARED_ENTRY_BYTES)
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=name)
+        buf = self.shared_memory.buf
+        end_keys = 8 + 8 * n_entries
+        end_data = end_keys + 8 * n_entries
+        self.header = buf[:8].cast('Q')
+        self.keys = buf[8:end_keys].cast('Q')
+        self.data = buf[end_keys:end_data].cast('Q')
+        # The same words, read as floats and as integers for the check of the key
+        self.values = buf[end_data:end_data + 8 * n_entries].cast('d')
+        self.value_bits = buf[end_data:end_data + 8 * n_entries].cast('Q')
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def share(self):
+        """
+        :return: dict describing the table, to give to attach in another process
+        """
+        return {"name": self.shared_memory.name, "max_entries": self.capacity}
+
+    @classmethod
+    def attach(cls, description):
+        """
+        Use the table of another process
+        :param description: dict returned by the share method of the table
+        :return: SharedTranspositionTable
+        """
+        return cls(description["max_entries"], name=description["name"])
+
+    def close(self, unlink=False):
+        """
+        Stop using the shared memory block of the table
+        :param unlink: whether to also free the block, which only its creator should do
+        :return:
+        """
+        for view in (self.header, self.keys, self.data, self.values, self.value_bits):
+            view.release()
+        self.shared_memory.close()
+        if unlink:
+            self.shared_memory.unlink()
+
+    @property
+    def generation(self):
+        """Number of the current search, shared by all the processes"""
+        return self.header[0]
+
+    def new_search(self):
+        """
+        Mark the entries stored so far as belonging to a previous search
+        :return:
+        """
+        self.header[0] = (self.header[0] + 1) & 0xFFFF
+
+    def _read(self, index, key):
+        """
+        Read an entry if it holds a key and was not torn by concurrent writes
+        :return: tuple (key, depth, flag, value, move, generation) or None
+        """
+        data = self.data[index]
+        if not data:
+            return None
+        bits = self.value_bits[index]
+        value = self.values[index]
+        if self.keys[index] ^ data ^ bits != key or self.value_bits[index] != bits:
+            return None
+        return key, data & 0xFF, data >> 8 & 3, value, data >> 10 & 7, data >> 16 & 0xFFFF
+
+    def _stored_key(self, index):
+        """
+        :return: key of the entry at an index, or None if it is unoccupied
+        """
+        data = self.data[index]
+        if not data:
+            return None
+        return self.keys[index] ^ data ^ self.value_bits[index]
+
+    def _write(self, index, key, data, value):
+        self.values[index] = value
+        bits = self.value_bits[index]
+        self.data[index] = data
+        self.keys[index] = key ^ data ^ bits
+
+    def probe(self, key):
+        """
+        Look up the entry of a position
+        :param key: zobrist key of the position
+        :return: tuple (key, depth, flag, value, move, generation) or None if the position is not stored
+        """
+        self.probes += 1
+        slot = key & self.mask
+        entry = self._read(slot, key)
+        if entry is None:
+            entry = self._read(slot + self.mask + 1, key)
+            if entry is None:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, move):
+        """
+        Store the result of a search, with the replacement scheme of TranspositionTable.store
+        :param key: zobrist key of the position
+        :param depth: remaining depth searched below the position
+        :param flag: EXACT, LOWER or UPPER
+        :param value: value found by the search
+        :param move: best move found by the search
+        :return:
+        """
+        self.stores += 1
+        slot = key & self.mask
+        generation = self.header[0]
+        data = min(depth, 0xFF) | flag << 8 | move << 10 | generation << 16 | _OCCUPIED
+        deepest = self.data[slot]
+        if not deepest or deepest & 0xFF <= depth or deepest >> 16 & 0xFFFF != generation:
+            deepest_key = self._stored_key(slot)
+            deepest_value = self.values[slot]
+            self._write(slot, key, data, value)
+            if deepest_key is None or deepest_key == key:
+                return
+            # The replaced entry is still worth keeping until something newer needs the slot
+            entry_key, data, value = deepest_key, deepest, deepest_value
+        else:
+            entry_key = key
+
+        index = slot + self.mask + 1
+        replaced_key = self._stored_key(index)
+        if replaced_key is not None and replaced_key != key and replaced_key != entry_key:
+            self.evictions += 1
+        self._write(index, entry_key, data, value)
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters
+        :return:
+        """
+        for index in range(len(self.data)):
+            self.data[index] = 0
+        self.probes = self.hits = self.stores = self.evictions = 0
+
+    @property
+    def capacity(self):
+        """Maximum number of entries held by the table"""
+        return 2 * (self.mask + 1)
+
+    @property
+    def hit_rate(self):
+        """Fraction of the probes that found their position"""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """
+        Return the counters of the table
+        :return: dict
+        """
+        return {"capacity": self.capacity,
+                "probes": self.probes,
+                "hits": self.hits,
+                "hit_rate": self.hit_rate,
+                "stores": self.stores,
+                "evictions": self.evictions}
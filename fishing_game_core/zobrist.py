@@ -0,0 +1,125 @@
+"""
+Zobrist hashing for game tree states.
+
+Every feature of a state (a hook on a cell, a fish on a cell, a fish on a player's rod, the score difference,
+the player to move) owns a fixed random 64-bit key, and the hash of a state is the xor of the keys of the
+features it contains. Moving a hook or a fish therefore only costs two xors, which lets next_state_fields update
+the hash of a child from the hash of its parent.
+
+Keys are derived with splitmix64 from the identity of the feature, so they are the same in every process and
+do not depend on the seed of the game.
+"""
+
+SPACE_SUBDIVISIONS = 20
+N_CELLS = SPACE_SUBDIVISIONS * SPACE_SUBDIVISIONS
+
+_MASK = (1 << 64) - 1
+
+# Feature kinds, used to derive independent keys
+_KIND_HOOK = 1
+_KIND_FISH = 2
+_KIND_CAUGHT = 3
+_KIND_SCORE = 4
+_KIND_STEP = 5
+_KIND_PLAYER = 7
+
+
+def _splitmix64(x):
+    """
+    Mix a 64-bit integer into a pseudo-random 64-bit integer
+    :param x: integer
+    :return: 64-bit integer
+    """
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _key(kind, i, j=0):
+    """
+    Return the key of a feature
+    :param kind: feature kind
+    :param i: first index of the feature (player, fish number, ...)
+    :param j: second index of the feature (cell, ...). Must be in [0, 2**24)
+    :return: 64-bit integer
+    """
+    return _splitmix64((kind << 56) | (i << 24) | j)
+
+
+def cell(pos):
+    """
+    Return the cell index of a position
+    :param pos: 2-tuple (x, y)
+    :return: integer in [0, N_CELLS)
+    """
+    return pos[0] * SPACE_SUBDIVISIONS + pos[1]
+
+
+# HOOK_KEYS[player][cell]
+HOOK_KEYS = [[_key(_KIND_HOOK, p, c) for c in range(N_CELLS)] for p in range(2)]
+# Xored in when player 1 (MIN) is to move
+PLAYER_KEY = _key(_KIND_PLAYER, 0)
+# FISH_KEYS[fish_number][cell], grown by ensure_fish
+FISH_KEYS = []
+# CAUGHT_KEYS[player][fish_number], grown by ensure_fish
+CAUGHT_KEYS = [[], []]
+# Keys of score differences and steps remaining, grown on demand
+_SCORE_KEYS = {}
+_STEP_KEYS = []
+
+
+def ensure_fish(number_of_fish):
+    """
+    Make sure keys exist for fish numbers in [0, number_of_fish)
+    :param number_of_fish: integer
+    :return:
+    """
+    for f in range(len(FISH_KEYS), number_of_fish):
+        FISH_KEYS.append([_key(_KIND_FISH, f, c) for c in range(N_CELLS)])
+        CAUGHT_KEYS[0].append(_key(_KIND_CAUGHT, 0, f))
+        CAUGHT_KEYS[1].append(_key(_KIND_CAUGHT, 1, f))
+
+
+def score_key(score_difference):
+    """
+    Return the key of a score difference (MAX score - MIN score)
+    :param score_difference: integer
+    :return: 64-bit integer
+    """
+    key = _SCORE_KEYS.get(score_difference)
+    if key is None:
+        key = _SCORE_KEYS[score_difference] = _key(_KIND_SCORE, 0, score_difference + (1 << 23))
+    return key
+
+
+def step_key(steps_left):
+    """
+    Return the key of the number of observation steps left in the game. Fish move differently at every step,
+    so equal states at different steps are different positions.
+    :param steps_left: integer
+    :return: 64-bit integer
+    """
+    while len(_STEP_KEYS) <= steps_left:
+        _STEP_KEYS.append(_key(_KIND_STEP, 0, len(_STEP_KEYS)))
+    return _STEP_KEYS[steps_left]
+
+
+def hash_state(state):
+    """
+    Compute the hash of a state from scratch
+    :param state: game_tree.State instance
+    :return: 64-bit integer
+    """
+    fish_positions = state.get_fish_positions()
+    ensure_fish(max(fish_positions.keys(), default=-1) + 1)
+    h = PLAYER_KEY if state.get_player() == 1 else 0
+    for player, pos in state.get_hook_positions().items():
+        h ^= HOOK_KEYS[player][cell(pos)]
+    for fish_number, pos in fish_positions.items():
+        h ^= FISH_KEYS[fish_number][cell(pos)]
+    for player, fish_number in enumerate(state.get_caught()):
+        if fish_number is not None:
+            h ^= CAUGHT_KEYS[player][fish_number]
+    score_p0, score_p1 = state.get_player_scores()
+    return h ^ score_key(score_p0 - score_p1)
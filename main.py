@@ -3,7 +3,6 @@ import multiprocessing as mp
 import sys
 
 import yaml
-from kivy.config import Config
 
 from fishing_game_core.shared import SettingLoader
 
@@ -20,10 +19,49 @@ class Settings:
         self.window_scale = 1.0
         # Time threshold
         self.time_threshold = 75*1e-3
+        # Part of the time threshold the minimax player keeps for everything else than its search, in seconds
+        self.search_safety_margin = 20*1e-3
+        # Learn the safety margin from the response times measured by the game, search_safety_margin is used until
+        # enough turns are measured
+        self.adaptive_safety_margin = True
         # Space subdivisions
         self.space_subdivisions = 20
         # Number of frames before an action is executed
         self.frames_per_action = 10
+        # Maximum number of entries in the transposition table of the minimax player
+        self.transposition_table_size = 1 << 17
+        # Search on a game tree of Node objects, 'tree', or in place on a single state, 'make_unmake'
+        self.search_mode = "tree"
+        # Search algorithm of the minimax player: alpha-beta 'minimax' or principal variation search 'pvs'
+        self.search_algorithm = "minimax"
+        # Windows of the searches of iterative deepening: always the full window, 'full_window', a window around the
+        # value of the previous iteration widened on failure, 'aspiration', or null windows only, 'mtdf'
+        self.search_driver = "full_window"
+        # Order the moves of the minimax player by the heuristic value of the children, 'heuristic', or by the
+        # killer, history and countermove tables learnt from the cutoffs of the search, 'history'
+        self.move_ordering = "history"
+        # Answer before the deadline once the best move of the minimax player was the same for this many iterations
+        # in a row and the other moves are worse by at least early_commit_margin. 0 always searches until the deadline.
+        self.early_commit_iterations = 0
+        self.early_commit_margin = 1.0
+        # Search the position left to the opponent while waiting for the next message, and reuse the results
+        self.ponder = False
+        # Helper processes of the parallel (Lazy SMP) search of the minimax player, 0 searches in its process only
+        self.search_workers = 0
+        # Number of fish from which the minimax player evaluates its positions with NumPy arrays instead of a loop
+        self.numpy_evaluation_min_fish = 16
+        # Evaluate the positions of the minimax player from rankings of the fish shared by the states of a step
+        self.incremental_evaluation = True
+        # Maximum number of state values kept by the evaluation cache of the minimax player, 0 for no cache
+        self.evaluation_cache_size = 1 << 16
+        # Evaluate the positions of the minimax player from the moves its hook needs to meet the fish along their
+        # trajectories instead of the distances, and sort its moves by them before the history scores
+        self.intercept_tables = True
+        self.intercept_move_ordering = False
+        # Messages sent to the player: all the remaining observations every turn, 'full', or the observations once
+        # in the first message and then only the state of the game, 'delta'. 'shared_memory' is 'delta' with the
+        # observations in a shared memory block instead of the first message (Python 3.8+, else same as 'delta').
+        self.protocol = "full"
 
     def load_from_dict(self, dictionary):
         """
@@ -33,6 +71,23 @@ class Settings:
         """
         self.observations_file = dictionary.get("observations_file")
         self.player_type = dictionary.get("player_type", "human")
+        self.transposition_table_size = dictionary.get("transposition_table_size", self.transposition_table_size)
+        self.search_mode = dictionary.get("search_mode", self.search_mode)
+        self.search_algorithm = dictionary.get("search_algorithm", self.search_algorithm)
+        self.search_driver = dictionary.get("search_driver", self.search_driver)
+        self.move_ordering = dictionary.get("move_ordering", self.move_ordering)
+        self.early_commit_iterations = dictionary.get("early_commit_iterations", self.early_commit_iterations)
+        self.early_commit_margin = dictionary.get("early_commit_margin", self.early_commit_margin)
+        self.ponder = dictionary.get("ponder", self.ponder)
+        self.search_workers = dictionary.get("search_workers", self.search_workers)
+        self.numpy_evaluation_min_fish = dictionary.get("numpy_evaluation_min_fish", self.numpy_evaluation_min_fish)
+        self.incremental_evaluation = dictionary.get("incremental_evaluation", self.incremental_evaluation)
+        self.evaluation_cache_size = dictionary.get("evaluation_cache_size", self.evaluation_cache_size)
+        self.intercept_tables = dictionary.get("intercept_tables", self.intercept_tables)
+        self.intercept_move_ordering = dictionary.get("intercept_move_ordering", self.intercept_move_ordering)
+        self.protocol = dictionary.get("protocol", self.protocol)
+        self.search_safety_margin = dictionary.get("search_safety_margin", self.search_safety_margin)
+        self.adaptive_safety_margin = dictionary.get("adaptive_safety_margin", self.adaptive_safety_margin)
 
 
 class Application(SettingLoader):
@@ -71,7 +126,28 @@ class Application(SettingLoader):
             self.game_controller.set_seed(120283473)
         self.start_game()
 
+    def start_headless(self):
+        """
+        Play the game without graphical interface and print its results
+        :return:
+        """
+        from fishing_game_core.headless import HeadlessGame
+        if self.settings.player_type != "ai_minimax":
+            raise AttributeError("Only the ai_minimax player can play without graphical interface")
+        game = HeadlessGame()
+        game.load_settings(self.settings)
+        stats = game.run(self.get_player_controller())
+        print("Final score:", stats["score_p0"] - stats["score_p1"])
+        print("Player 0 final score:", stats["score_p0"])
+        print("Player 1 final score:", stats["score_p1"])
+        print("Number of caught fishes by player 0:", stats["num_fishes_caught_p0"])
+        print("Number of caught fishes by player 1:", stats["num_fishes_caught_p1"])
+
     def select_and_launch_player_loop(self):
+        if self.settings.protocol == "shared_memory":
+            from fishing_game_core.observations import start_resource_tracker
+            start_resource_tracker()
+
         # Create process
         self.player_loop = mp.Process(
             target=self.player_controller.player_loop)
@@ -134,6 +210,8 @@ if __name__ == '__main__':
         description="Run the fishing derby KTH app")
     arguments_parser.add_argument("config_file", type=str,
                                   help="Configuration file")
+    arguments_parser.add_argument("--headless", action="store_true",
+                                  help="Play without graphical interface, as fast as the player answers")
     args = arguments_parser.parse_args()
 
     # Load the settings from the yaml file
@@ -141,7 +219,14 @@ if __name__ == '__main__':
     settings_dictionary = yaml.safe_load(open(args.config_file, 'r'))
     settings.load_from_dict(settings_dictionary)
 
+    if args.headless:
+        app = Application()
+        app.load_settings(settings)
+        app.start_headless()
+        sys.exit(0)
+
     # Set window dimensions
+    from kivy.config import Config
     Config.set('graphics', 'resizable', False)
     Config.set('graphics', 'width', str(int(settings.window_scale * 800)))
     Config.set('graphics', 'height', str(int(settings.window_scale * 600)))
@@ -1,13 +1,32 @@
 #!/usr/bin/env python3
 from typing import List, Tuple, Optional, Dict
-import time
+import gc
+import multiprocessing as mp
+from multiprocessing import util
 
 import random
-import math
 
-from fishing_game_core.game_tree import Node
+from fishing_game_core.deadline import (Deadline, OverheadEstimator, SearchTimeout, search_budget,
+                                        DEFAULT_SAFETY_MARGIN)
+from fishing_game_core.evaluation import (Evaluator, EvaluationCache, leaf_fields, NUMPY_MIN_FISH,
+                                          DEFAULT_CACHE_ENTRIES)
+from fishing_game_core.game_tree import Node, NodeCursor, SearchState
+from fishing_game_core.intercept import InterceptTables
+from fishing_game_core.observations import ObservationTable
+from fishing_game_core.ordering import MoveOrdering, N_MOVES
 from fishing_game_core.player_utils import PlayerController
 from fishing_game_core.shared import ACTION_TO_STR
+from fishing_game_core import zobrist
+from fishing_game_core.transposition import (TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER,
+                                             DEFAULT_ENTRIES, shared_memory)
+
+# Width of the null windows of the principal variation search. The heuristic is real valued, so a window of
+# (alpha, alpha + 1) would not be empty, and values closer than this are taken as equal.
+NULL_WINDOW = 1e-9
+# Half width of the first aspiration window around the value of the previous iteration, doubled at every failure
+ASPIRATION_WINDOW = 0.5
+# Null window searches of an MTD(f) iteration before it falls back to a full window search
+MAX_MTDF_SEARCHES = 24
 
 
 class PlayerControllerHuman(PlayerController):
@@ -32,6 +51,45 @@ class PlayerControllerMinimax(PlayerController):
 
     def __init__(self):
         super(PlayerControllerMinimax, self).__init__()
+        # Search state kept from one turn to the next
+        self.transposition_table: Optional[TranspositionTable] = None
+        self.root: Optional[Node] = None  # root of the previous search
+        self.last_move: Optional[int] = None  # move played from self.root
+        self.principal_variation: List[int] = []  # best line found by the previous search, from self.root
+        self.reached_depth: int = 0  # depth of the last completed iteration of the previous search
+        self.root_value: Optional[float] = None  # value of the last completed iteration
+        # Root searches of the current turn, and how many of them repeated an iteration after a window failed
+        self.root_searches: int = 0
+        self.re_searches: int = 0
+        # Killer, history and countermove tables, and whether they order the moves instead of the heuristic
+        self.move_ordering: MoveOrdering = MoveOrdering()
+        self.history_ordering: bool = False
+        self.evaluator: Evaluator = Evaluator()
+        self.incremental_evaluation: bool = True
+        # Values of the states evaluated last, kept from one turn to the next. None when disabled.
+        self.evaluation_cache: Optional[EvaluationCache] = None
+        self.deadline: Deadline = Deadline()
+        # Time out of the search learnt from the response times echoed by the game
+        self.overhead: OverheadEstimator = OverheadEstimator()
+        self.turn_start: Optional[float] = None  # time of self.deadline.clock at which the message of the turn arrived
+        self.search_time: Optional[float] = None  # time of the last turn spent in the search budget
+        # Observation sequences of the game, sent in the first message with the delta protocol
+        self.observation_table: Optional[ObservationTable] = None
+        # Helper processes of the parallel search, their pipes, and the number of the turn they search
+        self.search_workers: List[mp.Process] = []
+        self.worker_connections: list = []
+        self.search_turn: int = 0
+
+    def search_position(self, node: Node):
+        """
+        Return the position the search plays moves on, as selected by the search_mode setting: a NodeCursor
+        walking the game tree ("tree") or a SearchState played in place without building a tree ("make_unmake")
+        :param node: root node
+        :return: NodeCursor or SearchState
+        """
+        if self.get_setting("search_mode", "tree") == "make_unmake":
+            return SearchState(node)
+        return NodeCursor(node)
 
     def player_loop(self):
         """
@@ -41,25 +99,148 @@ class PlayerControllerMinimax(PlayerController):
 
         # Generate first message (Do not remove this line!)
         first_msg = self.receiver()
-
+        self.observation_table = ObservationTable.from_first_message(first_msg)
+
+        # The game tree is kept between turns and is full of reference cycles, so a garbage collection in the
+        # middle of a search can take longer than the search itself. Collect while the opponent moves instead.
+        # Objects that live for the whole game are frozen first, so that collections do not go through them again.
+        self.transposition_table = TranspositionTable(self.get_setting("transposition_table_size", DEFAULT_ENTRIES))
+        self.evaluation_cache = self.new_evaluation_cache()
+        self.start_search_workers(self.get_setting("search_workers", 0))
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            # Python 3.7+
+            gc.freeze()
+        gc.disable()
+
+        first_turn: bool = True
         while True:
             msg = self.receiver()
+            self.turn_start = self.deadline.clock()
+            if msg.get("response_time") is not None and self.search_time is not None:
+                self.overhead.add(msg["response_time"], self.search_time)
+            # The search workers complete the message themselves, it is smaller before
+            message = dict(msg) if self.search_workers else None
+            if self.observation_table is not None:
+                msg = self.observation_table.complete_message(msg)
 
-            # Create the root node of the game tree
-            node = Node(message=msg, player=0)
+            # Create the root node of the game tree, reusing the tree of the previous turn when possible
+            node = self.reroot(Node(message=msg, player=0))
 
             # Possible next moves: "stay", "left", "right", "up", "down"
-            best_move = self.search_best_next_move(initial_tree_node=node)
+            best_move = self.search_best_next_move(initial_tree_node=node, message=message)
 
             # Execute next action
-            self.sender({"action": best_move, "search_time": None})
+            self.sender({"action": best_move, "search_time": None, "search_depth": self.reached_depth,
+                         "re_searches": self.re_searches,
+                         "evaluation_cache_hit_rate": self.evaluation_cache_hit_rate()})
+            if first_turn:
+                # The first answer also waited for the start of the player and of its search workers, which is not
+                # part of the usual time out of the search
+                self.search_time, first_turn = None, False
+
+            gc.collect()
+
+            if self.get_setting("ponder", False):
+                self.ponder()
 
-    def search_best_next_move(self, initial_tree_node):
+    def reroot(self, node: Node) -> Node:
+        """
+        Find the node of the previous game tree reached by the move played last turn and the opponent's reply.
+        If it matches the new root, it replaces it, so its already computed subtree is reused, and the principal
+        variation is shifted by the two plies played. The game tree of the root is kept too, with its trajectories,
+        which lets the next search keep its intercept tables. The two plies are reached with get_child, which only
+        computes the nodes the search did not: all of them in the make_unmake search mode, which builds no tree.
+        :param node: root node built from the current message
+        :return: root node to search from
+        """
+        previous, played, pv = self.root, self.last_move, self.principal_variation
+        self.root, self.last_move, self.principal_variation = node, None, []
+        if previous is None or played is None:
+            return node
+
+        steps_left = len(node.observations) - node.depth
+        if played not in previous.legal_moves():
+            return node
+        child = previous.get_child(played)
+        for reply in child.legal_moves():
+            grandchild = child.get_child(reply)
+            if (grandchild.state.hash == node.state.hash
+                    and len(grandchild.observations) - grandchild.depth == steps_left):
+                grandchild.parent = None
+                self.root = grandchild
+                if pv[:2] == [played, grandchild.move]:
+                    self.principal_variation = pv[2:]
+                return grandchild
+        return node
+
+    def start_search_workers(self, n_workers: int):
+        """
+        Start the helper processes of the Lazy SMP search: every turn, they search the same root as this process
+        through a transposition table in shared memory, which replaces the table of this process, and send back
+        the results of their completed iterations. Nothing is started without multiprocessing.shared_memory
+        (Python < 3.8), the search then runs in this process only.
+        :param n_workers: number of helper processes, 0 for none
+        :return:
+        """
+        if n_workers <= 0 or shared_memory is None:
+            return
+        self.transposition_table = SharedTranspositionTable(
+            self.get_setting("transposition_table_size", DEFAULT_ENTRIES))
+        description = self.transposition_table.share()
+        for index in range(n_workers):
+            connection, worker_connection = mp.Pipe()
+            worker = SearchWorker(index, worker_connection, description, self.settings, self.observation_table)
+            process = mp.Process(target=worker.worker_loop, daemon=True)
+            process.start()
+            worker_connection.close()
+            self.search_workers.append(process)
+            self.worker_connections.append(connection)
+        # Run when this process exits, before its daemon processes are terminated
+        util.Finalize(self, self.stop_search_workers, exitpriority=10)
+
+    def stop_search_workers(self):
+        """
+        Stop the helper processes of the parallel search and free the shared transposition table
+        :return:
+        """
+        for connection in self.worker_connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self.search_workers:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        self.search_workers, self.worker_connections = [], []
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table.close(unlink=True)
+            self.transposition_table = None
+
+    def evaluation_cache_hit_rate(self) -> Optional[float]:
+        """
+        :return: hit rate of the evaluation cache in the search of this turn, None without cache or search
+        """
+        if self.evaluation_cache is None or not self.evaluation_cache.lookups:
+            return None
+        return self.evaluation_cache.hit_rate
+
+    def new_evaluation_cache(self) -> Optional[EvaluationCache]:
+        """
+        :return: EvaluationCache of the size of the evaluation_cache_size setting, or None if it is 0
+        """
+        size: int = self.get_setting("evaluation_cache_size", DEFAULT_CACHE_ENTRIES)
+        return EvaluationCache(size) if size > 0 else None
+
+    def search_best_next_move(self, initial_tree_node, message=None):
         """
         Use minimax (and extensions) to find best possible next move for player 0 (green boat)
         :param initial_tree_node: Initial game tree node
         :type initial_tree_node: game_tree.Node
             (see the Node class in game_tree.py for more information!)
+        :param message: message of the game the node was built from, before its completion by the observation
+            table, given to the search workers. None searches in this process only.
         :return: either "stay", "left", "right", "up" or "down"
         :rtype: str
         """
@@ -69,109 +250,646 @@ class PlayerControllerMinimax(PlayerController):
         # NOTE: Don't forget to initialize the children of the current node
         #       with its compute_and_get_children() method!
 
-        depth: int = 12  # higher number means more time to search deeper depths
-        self.end_condition: float = time.time() + 55 * 1e-3
-        self.transposition_table: Dict[str, Tuple[float, int]] = {}
-
-        # iterative deepening search
-        while not self.cutoff_test(depth):
-            best_value, best_move = self.minimax(initial_tree_node, True, depth)
-            depth += 1
-            #  maybe cutoff if depth is too high, or score is too high if good enough.
-            #  1000 not necessary since it is already so restrictive. 10 is enough tbh, or not even needed to be honest
-            #  nvm it is score + max distance so higher number is necesarry
-            #  however it should be - quisence search
-            #  nvm that is not quiscence search, it is not applicable to this assignment
-            #  or maybe i dont knnow
-        # print(best_value)
-        # print(depth)
+        self.deadline.start(search_budget(self.get_setting("time_threshold", 75 * 1e-3), self.safety_margin()),
+                            start=self.turn_start)
+        if self.transposition_table is None:
+            self.transposition_table = TranspositionTable(
+                self.get_setting("transposition_table_size", DEFAULT_ENTRIES))
+        self.transposition_table.new_search()
+        if self.evaluation_cache is not None:
+            self.evaluation_cache.new_search()
+        self.move_ordering.new_search(len(initial_tree_node.observations) - initial_tree_node.depth)
+        self.evaluator.new_search(initial_tree_node.depth)
+
+        position = self.search_position(initial_tree_node)
+        self.root_searches, self.re_searches = 0, 0
+        moves: Tuple[int, ...] = position.legal_moves()
+        if len(moves) <= 1:
+            # Forced move, a fish is on the rod, or end of the game: answer at once. The table keeps the results of
+            # the previous search, two plies shallower again from the next root.
+            self.reached_depth = max(0, self.reached_depth - 2)
+            best_move: int = moves[0] if moves else 0
+        else:
+            # When the game went along the principal variation, the table already holds results two plies
+            # shallower than the previous search, so start from there
+            depth: int = max(1, self.reached_depth - 2) if self.principal_variation else 1
+            if message is not None and self.search_workers:
+                self.search_turn += 1
+                job = (self.search_turn, message, self.deadline.remaining(), depth)
+                for connection in self.worker_connections:
+                    connection.send(job)
+            self.new_intercept_tables(initial_tree_node)
+            best_move = self.iterative_deepening(position, depth)
+            if message is not None and self.search_workers:
+                best_move = self.collect_worker_results(initial_tree_node, best_move)
+        if self.turn_start is not None:
+            self.search_time = min(self.deadline.clock(), self.deadline.end) - self.turn_start
+
+        self.last_move = best_move
         return ACTION_TO_STR[best_move]
 
-    def minimax(self, node: Node, player: bool, depth: int,
-                alpha: float = float('-inf'), beta: float = float('inf')) -> Tuple[float, int]:
+    def new_intercept_tables(self, node: Node):
         """
-        node contains state
-        player = True/False (max/min)
-        returns value
+        Set the intercept tables of the root of a search for the evaluation when the intercept_tables setting is
+        set, and for the move ordering when intercept_move_ordering is set too, keeping those of the previous search
+        when they still reach far enough, see fishing_game_core.intercept
+        :param node: root node
+        :return:
         """
+        intercepts: Optional[InterceptTables] = None
+        if self.get_setting("intercept_tables", True):
+            intercepts = self.evaluator.intercepts
+            if intercepts is None or not intercepts.reusable(node.trajectories, node.depth):
+                intercepts = InterceptTables(node.trajectories, node.depth, node.state.player,
+                                             node.state.fish_scores)
+                if self.evaluation_cache is not None:
+                    # Its values were read from the previous tables
+                    self.evaluation_cache.clear()
+        self.evaluator.set_intercepts(intercepts)
+        self.move_ordering.intercepts = intercepts if self.get_setting("intercept_move_ordering", False) else None
+
+    def iterative_deepening(self, position, depth: int = 1) -> int:
+        """
+        Search the root position one depth deeper at a time until the deadline, or until the best move is
+        stable enough to commit to it early, see early_commit
+        :param position: root position, NodeCursor or SearchState
+        :param depth: depth of the first iteration
+        :return: best move of the last completed iteration
+        """
+        self.reached_depth = 0
+        max_depth: int = position.steps_left
+        best_move: int = 0
+        stable_iterations: int = 0  # completed iterations in a row that found best_move
+        driver = self.get_setting("search_driver", "full_window")
+
+        try:
+            while depth <= max_depth and not self.deadline.expired():
+                if driver == "aspiration" and self.root_value is not None:
+                    value, move = self.aspiration_search(position, depth, self.root_value)
+                elif driver == "mtdf" and self.root_value is not None:
+                    value, move = self.mtdf_search(position, depth, self.root_value)
+                else:
+                    value, move = self.search(position, depth)
+                stable_iterations = stable_iterations + 1 if move == best_move and self.reached_depth else 1
+                best_move = move
+                self.root_value = value
+                self.reached_depth = depth
+                self.principal_variation = self.extract_principal_variation(position, depth)
+                self.iteration_completed(depth, value, move)
+                if self.early_commit(position, depth, value, move, stable_iterations):
+                    break
+                depth += 1
+        except SearchTimeout:
+            # The unfinished nodes stored nothing and position is left where it stopped, it is not used again
+            pass
+        return best_move
 
-        if self.cutoff_test(depth):
-            return self.heuristic(node), 0
+    def early_commit(self, position, depth: int, value: float, move: int, stable_iterations: int) -> bool:
+        """
+        Decide whether to stop the search before the deadline: the best move must have been the same for the last
+        early_commit_iterations iterations (0 never stops early), and every other move must be worse by at least
+        early_commit_margin, which null window searches of the other moves verify
+        :param position: root position, NodeCursor or SearchState
+        :param depth: depth of the iteration just completed
+        :param value: value of the position at this depth
+        :param move: best move at this depth
+        :param stable_iterations: number of iterations in a row that found move
+        :return: True to answer move now
+        """
+        iterations: int = self.get_setting("early_commit_iterations", 0)
+        if not iterations or stable_iterations < iterations:
+            return False
+        bound: float = value - self.get_setting("early_commit_margin", 1.0)
+        pvs: bool = self.get_setting("search_algorithm", "minimax") == "pvs"
+        for other in position.legal_moves():
+            if other == move:
+                continue
+            position.make_move(other)
+            if pvs:
+                other_value = -self.pvs(position, depth - 1, -bound, -bound + NULL_WINDOW, -1, other)[0]
+            else:
+                other_value = self.minimax(position, False, depth - 1, bound - NULL_WINDOW, bound, other)[0]
+            position.unmake_move()
+            if other_value >= bound:
+                return False
+        return True
+
+    def iteration_completed(self, depth: int, value: float, move: int):
+        """
+        Called by iterative_deepening after every completed iteration
+        :param depth: depth of the iteration
+        :param value: value of the root position at this depth, for player 0
+        :param move: best move at this depth
+        :return:
+        """
+        pass
 
-        key: str = str(node.state.get_fish_positions()) + str(node.state.get_hook_positions()) + str(depth)
-        if key in self.transposition_table:
-            return self.transposition_table[key]
+    def collect_worker_results(self, node: Node, best_move: int) -> int:
+        """
+        Read the iterations the search workers completed during this turn, and take the deepest one if it is
+        deeper than the iteration of this process. Its principal variation is read from the shared table.
+        :param node: root node of the turn
+        :param best_move: best move found by this process
+        :return: best move
+        """
+        deepest: Optional[Tuple[int, float, int]] = None
+        for connection in self.worker_connections:
+            while connection.poll():
+                turn, depth, value, move = connection.recv()
+                if turn == self.search_turn and depth > (self.reached_depth if deepest is None else deepest[0]):
+                    deepest = (depth, value, move)
+        if deepest is None:
+            return best_move
+        self.reached_depth, self.root_value, best_move = deepest
+        self.principal_variation = self.extract_principal_variation(self.search_position(node), self.reached_depth)
+        return best_move
+
+    def safety_margin(self) -> float:
+        """
+        Return the time of the time threshold kept out of the search: the search_safety_margin setting, or a high
+        percentile of the time measured out of the search in the last turns if adaptive_safety_margin is set
+        :return: seconds
+        """
+        default: float = self.get_setting("search_safety_margin", DEFAULT_SAFETY_MARGIN)
+        if self.get_setting("adaptive_safety_margin", True):
+            return self.overhead.safety_margin(default)
+        return default
 
-        children: List[Node] = node.compute_and_get_children()
+    def search(self, position, depth: int,
+               alpha: float = float('-inf'), beta: float = float('inf'), color: int = 1) -> Tuple[float, int]:
+        """
+        Search the root position with the algorithm of the search_algorithm setting, alpha-beta minimax
+        ("minimax") or principal variation search ("pvs"). Both fail soft: a value outside of (alpha, beta) is a
+        bound of the value of the position.
+        :param position: root position, NodeCursor or SearchState
+        :param depth: search depth
+        :param alpha: lower end of the search window
+        :param beta: upper end of the search window
+        :param color: 1 if player 0 is to move at the root, -1 if player 1 is
+        :return: (value for player 0, move)
+        """
+        self.root_searches += 1
+        self.history_ordering = self.get_setting("move_ordering", "history") == "history"
+        self.evaluator.numpy_min_fish = self.get_setting("numpy_evaluation_min_fish", NUMPY_MIN_FISH)
+        self.incremental_evaluation = self.get_setting("incremental_evaluation", True)
+        if self.get_setting("search_algorithm", "minimax") == "pvs":
+            if color > 0:
+                return self.pvs(position, depth, alpha, beta, 1)
+            value, move = self.pvs(position, depth, -beta, -alpha, -1)
+            return -value, move
+        return self.minimax(position, color > 0, depth, alpha, beta)
+
+    def ponder(self):
+        """
+        Search the position left to the opponent by the move just played, until the next message of the game
+        arrives, instead of waiting for it. The transposition table and the game tree then already hold the
+        results of the next root, and the next search starts from the depth reached here.
+        :return:
+        """
+        if self.root is None or self.last_move is None or self.last_move not in self.root.legal_moves():
+            return
+        position = self.search_position(self.root.get_child(self.last_move))
+        if not position.legal_moves():
+            return
+        # Stops as soon as a message is waiting, the pipe is polled at every reading of the clock
+        self.deadline.start(float("inf"), stop=self.receiver_pipe.poll)
+        depth: int = max(1, self.reached_depth - 1) if self.principal_variation[:1] == [self.last_move] else 1
+        pondered_depth: int = 0
+        try:
+            while depth <= position.steps_left and not self.deadline.expired():
+                self.search(position, depth, color=-1)
+                pondered_depth = depth
+                variation = self.extract_principal_variation(position, depth)
+                depth += 1
+        except SearchTimeout:
+            pass
+        if pondered_depth and pondered_depth + 1 > self.reached_depth:
+            # Depths and variation are counted from self.root, one ply above the pondered position
+            self.reached_depth = pondered_depth + 1
+            self.principal_variation = [self.last_move] + variation
+
+    def aspiration_search(self, position, depth: int, guess: float) -> Tuple[float, int]:
+        """
+        Search with a narrow window around a guess of the value, widened on the side where the search fails until
+        the value falls inside it
+        :param position: root position, NodeCursor or SearchState
+        :param depth: search depth
+        :param guess: value of the previous iteration
+        :return: (value for player 0, move)
+        """
+        delta: float = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            value, move = self.search(position, depth, alpha, beta)
+            if value <= alpha:
+                alpha = value - delta
+            elif value >= beta:
+                beta = value + delta
+            else:
+                return value, move
+            self.re_searches += 1
+            delta *= 2
+
+    def mtdf_search(self, position, depth: int, guess: float) -> Tuple[float, int]:
+        """
+        MTD(f): null window searches around a guess of the value, each one moving a lower or an upper bound of the
+        value, until they meet. The transposition table keeps the bounds found by the previous searches.
+        :param position: root position, NodeCursor or SearchState
+        :param depth: search depth
+        :param guess: value of the previous iteration
+        :return: (value for player 0, move)
+        """
+        lower, upper = float('-inf'), float('inf')
+        value, move = guess, 0
+        for i in range(MAX_MTDF_SEARCHES):
+            if upper - lower <= NULL_WINDOW:
+                return value, move
+            if i > 0:
+                self.re_searches += 1
+            beta = max(value, lower + NULL_WINDOW)
+            value, best = self.search(position, depth, beta - NULL_WINDOW, beta)
+            if value < beta:
+                upper = value
+            else:
+                # Only a search that fails high proves its move reaches the value
+                lower, move = value, best
+        self.re_searches += 1
+        return self.search(position, depth)
+
+    def extract_principal_variation(self, position, depth: int) -> List[int]:
+        """
+        Follow the best moves stored in the transposition table
+        :param position: root position, NodeCursor or SearchState
+        :param depth: maximum length of the variation
+        :return: list of moves
+        """
+        moves: List[int] = []
+        while len(moves) < depth:
+            entry = self.transposition_table.probe(position.state.hash ^ zobrist.step_key(position.steps_left))
+            if entry is None or entry[4] not in position.legal_moves():
+                break
+            position.make_move(entry[4])
+            moves.append(entry[4])
+        for _ in moves:
+            position.unmake_move()
+        return moves
+
+    def minimax(self, position, player: bool, depth: int,
+                alpha: float = float('-inf'), beta: float = float('inf'),
+                previous_move: Optional[int] = None) -> Tuple[float, int]:
+        """
+        position is a NodeCursor or a SearchState, see search_position
+        player = True/False (max/min)
+        previous_move is the move that led to position, None at the root
+        returns value
+        raises SearchTimeout once the deadline of the search has passed
+        """
 
-        # Move ordering based on heuristic score
-        children.sort(reverse=True, key=lambda x: self.heuristic(x))
+        state = position.state
+        if depth == 0:
+            return self.evaluate_position(position), 0
+        # Amortised time check, the clock is only read when the countdown runs out
+        deadline = self.deadline
+        deadline.countdown -= 1
+        if deadline.countdown <= 0:
+            deadline.check()
+
+        key: int = state.hash ^ zobrist.step_key(position.steps_left)
+        entry = self.transposition_table.probe(key)
+        tt_move: Optional[int] = None
+        if entry is not None:
+            _, entry_depth, flag, value, tt_move, _ = entry
+            # A deeper result can answer a shallower query
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value, tt_move
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value, tt_move
+        alpha_start, beta_start = alpha, beta
+
+        moves: Tuple[int, ...] = position.legal_moves()
+        if not moves:
+            # End of the observations, the game is over
+            return self.evaluate_position(position), 0
+
+        # Values of the children when they are all leaves, evaluated together
+        leaf_values: Optional[Dict[int, float]] = None
+        if self.history_ordering:
+            ordered_moves: List[int] = self.move_ordering.order(moves, tt_move, state, position.steps_left,
+                                                                previous_move)
+            if depth == 1 and self.batch_leaves(state):
+                leaf_values = self.evaluate_children(position, moves)
+        else:
+            # Move ordering based on heuristic score, with the best move of a previous search first
+            move_values: Dict[int, float] = self.evaluate_children(position, moves)
+            ordered_moves = sorted(moves, reverse=True, key=move_values.__getitem__)
+            if tt_move is not None:
+                ordered_moves.sort(key=lambda x: x != tt_move)
+            if depth == 1:
+                leaf_values = move_values
 
         # Forward pruning with beam search
-        # if len(children) == 5:
-        #    children = children[:3]
+        # if len(ordered_moves) == 5:
+        #    ordered_moves = ordered_moves[:3]
 
         best_value: float = float('-inf') if player else float('inf')
         best_move: int = 0
 
         if player:
             # look for max value
-            for child in children:
-                tmp_value, tmp_move = self.minimax(child, not player, depth - 1,
-                                                   alpha, beta)
+            for move in ordered_moves:
+                if leaf_values is not None:
+                    tmp_value = leaf_values[move]
+                else:
+                    position.make_move(move)
+                    tmp_value, tmp_move = self.minimax(position, not player, depth - 1,
+                                                       alpha, beta, move)
+                    position.unmake_move()
                 if tmp_value > best_value:  # cant do max cus we need the move
                     best_value = tmp_value
-                    best_move = child.move
+                    best_move = move
 
                 # prune if possible
                 alpha = max(alpha, best_value)
                 if beta <= alpha:
+                    self.move_ordering.record_cutoff(move, depth, state, position.steps_left, previous_move)
                     break
         else:
             # look for min value
-            for child in children:
-                tmp_value, tmp_move = self.minimax(child, not player, depth - 1,
-                                                   alpha, beta)
+            for move in ordered_moves:
+                if leaf_values is not None:
+                    tmp_value = leaf_values[move]
+                else:
+                    position.make_move(move)
+                    tmp_value, tmp_move = self.minimax(position, not player, depth - 1,
+                                                       alpha, beta, move)
+                    position.unmake_move()
                 if tmp_value < best_value:  # cant do min cus we need the move
                     best_value = tmp_value
-                    best_move = child.move
+                    best_move = move
 
                 # prune if possible
                 beta = min(beta, best_value)
                 if beta <= alpha:
+                    self.move_ordering.record_cutoff(move, depth, state, position.steps_left, previous_move)
                     break
 
-        # add best value and move to transposition table
-        self.transposition_table[key] = (best_value, best_move)
+        # add best value and move to transposition table, with the kind of bound the value is
+        if best_value <= alpha_start:
+            flag = UPPER
+        elif best_value >= beta_start:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.transposition_table.store(key, depth, flag, best_value, best_move)
         return best_value, best_move
 
-    def heuristic(self, node):
+    def pvs(self, position, depth: int, alpha: float, beta: float, color: int,
+            previous_move: Optional[int] = None) -> Tuple[float, int]:
+        """
+        Principal variation search in negamax form. The first move is searched with the (alpha, beta) window and
+        the others with a null window, which only proves that they are not better. A move that turns out better
+        is searched again with the full window.
+        Values are seen by the player to move. The transposition table holds the values of player 0, as with
+        minimax, so that both searches can share it.
+        :param position: NodeCursor or SearchState, see search_position
+        :param depth: search depth
+        :param alpha: value the player to move is already sure to get
+        :param beta: value the opponent is already sure to hold the player to move to
+        :param color: 1 if player 0 is to move, -1 otherwise
+        :param previous_move: move that led to position, None at the root
+        :return: (value for the player to move, move)
+        :raise SearchTimeout: once the deadline of the search has passed
+        """
+        state = position.state
+        if depth == 0:
+            return color * self.evaluate_position(position), 0
+        deadline = self.deadline
+        deadline.countdown -= 1
+        if deadline.countdown <= 0:
+            deadline.check()
+
+        key: int = state.hash ^ zobrist.step_key(position.steps_left)
+        entry = self.transposition_table.probe(key)
+        tt_move: Optional[int] = None
+        if entry is not None:
+            _, entry_depth, flag, value, tt_move, _ = entry
+            if entry_depth >= depth:
+                # A lower bound for player 0 is an upper bound for player 1
+                value *= color
+                if color < 0 and flag != EXACT:
+                    flag = UPPER if flag == LOWER else LOWER
+                if flag == EXACT:
+                    return value, tt_move
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value, tt_move
+        alpha_start, beta_start = alpha, beta
+
+        moves: Tuple[int, ...] = position.legal_moves()
+        if not moves:
+            # End of the observations, the game is over
+            return color * self.evaluate_position(position), 0
+
+        # Values of the children for player 0 when they are all leaves, evaluated together
+        leaf_values: Optional[Dict[int, float]] = None
+        if self.history_ordering:
+            ordered_moves: List[int] = self.move_ordering.order(moves, tt_move, state, position.steps_left,
+                                                                previous_move)
+            if depth == 1 and self.batch_leaves(state):
+                leaf_values = self.evaluate_children(position, moves)
+        else:
+            # Move ordering based on the heuristic score for the player to move, with the best move of a previous
+            # search first
+            leaf_values = self.evaluate_children(position, moves)
+            ordered_moves = sorted(moves, reverse=True, key=lambda x: color * leaf_values[x])
+            if tt_move is not None:
+                ordered_moves.sort(key=lambda x: x != tt_move)
+            if depth != 1:
+                leaf_values = None
+
+        best_value: float = float('-inf')
+        best_move: int = 0
+        for i, move in enumerate(ordered_moves):
+            if leaf_values is not None:
+                # A leaf has the same value whatever the window
+                value = color * leaf_values[move]
+            else:
+                position.make_move(move)
+                if i == 0:
+                    value = -self.pvs(position, depth - 1, -beta, -alpha, -color, move)[0]
+                else:
+                    value = -self.pvs(position, depth - 1, -alpha - NULL_WINDOW, -alpha, -color, move)[0]
+                    if alpha < value < beta:
+                        # Better than the principal variation, find by how much
+                        value = -self.pvs(position, depth - 1, -beta, -value, -color, move)[0]
+                position.unmake_move()
+            if value > best_value:
+                best_value = value
+                best_move = move
+                alpha = max(alpha, best_value)
+                if beta <= alpha:
+                    self.move_ordering.record_cutoff(move, depth, state, position.steps_left, previous_move)
+                    break
 
-        # Get information from current game state
-        gameboard_size = 20
-        green_hook, fish_positions, fish_scores, boat_scores = (
-            node.state.get_hook_positions()[0],
-            node.state.get_fish_positions(),
-            node.state.get_fish_scores(),
-            node.state.get_player_scores(),
-        )
+        if best_value <= alpha_start:
+            flag = UPPER if color > 0 else LOWER
+        elif best_value >= beta_start:
+            flag = LOWER if color > 0 else UPPER
+        else:
+            flag = EXACT
+        self.transposition_table.store(key, depth, flag, color * best_value, best_move)
+        return best_value, best_move
 
-        score: float = boat_scores[0] - boat_scores[1]
+    def heuristic(self, node):
+        return self.evaluate(node.state)
 
-        # Calculate the maximum distance between the hook and the fish using functional programming
-        fish_distances = (fish_scores[fish_id] * math.exp(-1 * (min(abs(green_hook[0] - fish_coord[0]),
-                                                                    gameboard_size - abs(
-                                                                        green_hook[0] - fish_coord[0])) + abs(
-            green_hook[1] - fish_coord[1])))
-                          for fish_id, fish_coord in fish_positions.items()
-                          )
+    def evaluate(self, state):
+        """
+        Heuristic value of a state for player 0, see fishing_game_core.evaluation
+        :param state: State or SearchState
+        :return: value
+        """
+        return self.evaluator.evaluate(state)
 
-        max_distance = max(fish_distances, default=0)
+    def evaluate_position(self, position) -> float:
+        """
+        Heuristic value of the current state of a position for player 0, from the evaluation cache if it holds the
+        state, else read from the rankings of the fish of its step when the incremental_evaluation setting is set,
+        see Evaluator.evaluate_incremental
+        :param position: NodeCursor or SearchState
+        :return: value
+        """
+        state = position.state
+        cache = self.evaluation_cache
+        if cache is not None:
+            # The value of a state depends on its step with the intercept tables
+            key: int = state.hash ^ zobrist.step_key(position.steps_left)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        if self.incremental_evaluation:
+            value = self.evaluator.evaluate_incremental(state, position.trajectories, position.depth)
+        else:
+            value = self.evaluator.evaluate(state)
+        if cache is not None:
+            cache.put(key, value)
+        return value
 
-        return score + max_distance
+    def batch_leaves(self, state) -> bool:
+        """
+        :param state: state of a node whose children are leaves
+        :return: whether to evaluate the children together before searching them
+        """
+        return not self.incremental_evaluation and self.evaluator.vectorised(state)
 
-    def cutoff_test(self, depth: int) -> bool:
+    def evaluate_children(self, position, moves) -> Dict[int, float]:
+        """
+        Evaluate the children of a position, together in one vectorised pass when the game has enough fish
+        :param position: NodeCursor or SearchState
+        :param moves: moves leading to the children
+        :return: dict from move to the value of the child for player 0
+        """
+        if self.incremental_evaluation:
+            values: Dict[int, float] = {}
+            for move in moves:
+                position.make_move(move)
+                values[move] = self.evaluate_position(position)
+                position.unmake_move()
+            return values
+        # Only the children missing from the evaluation cache are evaluated
+        cache = self.evaluation_cache
+        values = {}
+        missing, leaves = [], []
+        for move in moves:
+            position.make_move(move)
+            state = position.state
+            key = state.hash ^ zobrist.step_key(position.steps_left)
+            value = cache.get(key) if cache is not None else None
+            if value is None:
+                missing.append((move, key))
+                leaves.append(leaf_fields(state))
+            else:
+                values[move] = value
+            position.unmake_move()
+        if leaves:
+            for (move, key), value in zip(missing, self.evaluator.evaluate_batch(leaves, position.state.fish_scores)):
+                values[move] = value
+                if cache is not None:
+                    cache.put(key, value)
+        return values
+
+
+class SearchWorker(PlayerControllerMinimax):
+    """
+    Helper process of the Lazy SMP search of PlayerControllerMinimax. It searches the root of every turn with
+    iterative deepening, through the transposition table shared with the player, so that the player finds in the
+    table what the workers already searched. Every other worker starts one depth deeper, and each one breaks the
+    ties of the move ordering in its own order, so that they do not all search the same nodes at the same time.
+    """
+
+    def __init__(self, index: int, connection, table_description: dict, settings, observation_table):
+        """
+        :param index: number of the worker, from 0
+        :param connection: end of the pipe to the player
+        :param table_description: description of the shared transposition table, see SharedTranspositionTable.share
+        :param settings: main.Settings instance of the player
+        :param observation_table: ObservationTable of the player, or None
+        """
+        super(SearchWorker, self).__init__()
+        self.index = index
+        self.connection = connection
+        self.table_description = table_description
+        self.load_settings(settings)
+        self.observation_table = observation_table
+        bias = list(range(N_MOVES))
+        random.Random(index).shuffle(bias)
+        self.move_ordering.move_bias = tuple(bias)
+
+    def worker_loop(self):
+        """
+        Search every job sent by the player, (turn, message, budget in seconds, first depth), until the player
+        sends None or closes the pipe. A search stops at the end of its budget or as soon as the next job arrives.
+        :return:
+        """
+        self.transposition_table = SharedTranspositionTable.attach(self.table_description)
+        self.evaluation_cache = self.new_evaluation_cache()
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            # Python 3.7+
+            gc.freeze()
+        gc.disable()
+        try:
+            while True:
+                job = self.connection.recv()
+                if job is None:
+                    break
+                self.search_turn, message, budget, depth = job
+                if self.observation_table is not None:
+                    message = self.observation_table.complete_message(message)
+                node = Node(message=message, player=0)
+                position = self.search_position(node)
+                # The player starts the new search of the shared table
+                self.deadline.start(budget, stop=self.connection.poll)
+                self.move_ordering.new_search(position.steps_left)
+                self.new_intercept_tables(node)
+                self.iterative_deepening(position, depth + self.index % 2)
+                gc.collect()
+        except (EOFError, OSError):
+            # The player ended
+            pass
+        finally:
+            self.transposition_table.close()
+
+    def iteration_completed(self, depth: int, value: float, move: int):
         """
-        return True if cutoff
+        Send the result of a completed iteration to the player
         """
-        return depth == 0 or time.time() >= self.end_condition
+        self.connection.send((self.search_turn, depth, value, move))
@@ -8,6 +8,7 @@ import math
 from fishing_game_core.game_tree import Node
 from fishing_game_core.player_utils import PlayerController
 from fishing_game_core.shared import ACTION_TO_STR
+from fishing_game_core.tables import BOARD_SIZE, N_CELLS, BLOCKED_DISTANCE
 
 
 class PlayerControllerHuman(PlayerController):
@@ -190,14 +191,11 @@ class PlayerControllerMinimax(PlayerController):
 
     def calculate_distance(self, node: Node, fish_coords: Tuple[int, int]) -> float:
         fish_x, fish_y = fish_coords
-        green_x, green_y = node.state.get_hook_positions()[0]
-        red_x, _ = node.state.get_hook_positions()[1]
-        y_distance: int = abs(green_y - fish_y)
-        x_distance: int = abs(green_x - fish_x)
+        green_x, green_y, red_x, _ = node.state.hooks
         # TODO need to check which player it is
-        if green_x < red_x < fish_x or fish_x < red_x < green_x:
-            x_distance = (20 - x_distance)
-        return x_distance + y_distance
+        # Moves of the green hook to the fish, around the board when the red hook is in the way
+        return BLOCKED_DISTANCE[((green_x * BOARD_SIZE + green_y) * N_CELLS + fish_x * BOARD_SIZE + fish_y) * BOARD_SIZE
+                                + red_x]
 
 
     def cutoff_test(self, depth: int) -> bool:
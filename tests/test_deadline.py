@@ -0,0 +1,106 @@
+import unittest
+
+from fishing_game_core.deadline import (Deadline, OverheadEstimator, SearchTimeout, MIN_CHECK_INTERVAL,
+                                        MIN_OVERHEAD_SAMPLES)
+
+
+class FakeClock:
+    """
+    Clock that only moves when told to
+    """
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def run_countdown(deadline):
+    """
+    Decrement the countdown as the search does at every node, until the clock is read
+    :return: number of nodes
+    """
+    nodes = 0
+    while True:
+        nodes += 1
+        deadline.countdown -= 1
+        if deadline.countdown <= 0:
+            deadline.check()
+            return nodes
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.deadline = Deadline(check_period=1e-3, clock=self.clock)
+
+    def test_expires_after_the_countdown(self):
+        self.deadline.start(0.1)
+        # No time elapsed since the start: the interval doubles
+        self.assertEqual(run_countdown(self.deadline), MIN_CHECK_INTERVAL)
+        self.assertEqual(self.deadline.check_interval, 2 * MIN_CHECK_INTERVAL)
+        # 2 nodes in 2 microseconds, so 1000 nodes per check_period
+        self.clock.now += 2e-6
+        self.assertEqual(run_countdown(self.deadline), 2 * MIN_CHECK_INTERVAL)
+        self.assertEqual(self.deadline.check_interval, 1000)
+        self.clock.now += 1e-3
+        self.assertEqual(run_countdown(self.deadline), 1000)
+        self.assertFalse(self.deadline.expired())
+        self.assertAlmostEqual(self.deadline.remaining(), 0.1 - 1e-3 - 2e-6)
+        # The deadline passes while the countdown runs, and is only seen when it runs out
+        self.clock.now = 100.2
+        self.assertTrue(self.deadline.expired())
+        with self.assertRaises(SearchTimeout):
+            run_countdown(self.deadline)
+        self.assertEqual(self.deadline.checks, 4)
+
+    def test_budget_counts_from_the_start_time(self):
+        self.deadline.start(0.1, start=99.95)
+        self.assertAlmostEqual(self.deadline.remaining(), 0.05)
+        self.clock.now = 100.05
+        with self.assertRaises(SearchTimeout):
+            self.deadline.check()
+
+    def test_stop_callback_ends_the_search_early(self):
+        stopped = []
+        self.deadline.start(float("inf"), stop=lambda: bool(stopped))
+        self.deadline.check()
+        self.assertFalse(self.deadline.expired())
+        stopped.append(True)
+        self.assertTrue(self.deadline.expired())
+        with self.assertRaises(SearchTimeout):
+            self.deadline.check()
+
+    def test_start_clears_the_stop_callback(self):
+        self.deadline.start(float("inf"), stop=lambda: True)
+        self.deadline.start(float("inf"))
+        self.deadline.check()
+        self.assertFalse(self.deadline.expired())
+
+
+class OverheadEstimatorTest(unittest.TestCase):
+    def test_default_until_enough_samples(self):
+        estimator = OverheadEstimator(percentile=100, slack=2e-3)
+        for _ in range(MIN_OVERHEAD_SAMPLES - 1):
+            estimator.add(0.06, 0.05)
+            self.assertEqual(estimator.safety_margin(20e-3), 20e-3)
+        estimator.add(0.06, 0.05)
+        self.assertAlmostEqual(estimator.safety_margin(20e-3), 0.01 + 2e-3)
+
+    def test_percentile_of_the_last_turns(self):
+        estimator = OverheadEstimator(window=10, percentile=90, slack=0.0)
+        for overhead in range(1, 21):
+            estimator.add(1.0 + overhead * 1e-3, 1.0)
+        # Turns 11 to 20 are kept, the 90th percentile of 10 samples is the 9th
+        self.assertAlmostEqual(estimator.safety_margin(20e-3), 19e-3)
+
+    def test_search_longer_than_the_response_counts_as_no_overhead(self):
+        estimator = OverheadEstimator(percentile=100, slack=0.0)
+        for _ in range(MIN_OVERHEAD_SAMPLES):
+            estimator.add(0.05, 0.06)
+        self.assertEqual(estimator.safety_margin(20e-3), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+from fishing_game_core.evaluation import EvaluationCache
+from player import PlayerControllerMinimax
+
+
+class FakeState:
+    def __init__(self, state_hash):
+        self.hash = state_hash
+
+
+class FakePosition:
+    """
+    Position with only what PlayerControllerMinimax.evaluate_position reads
+    """
+
+    def __init__(self, state_hash, steps_left):
+        self.state = FakeState(state_hash)
+        self.steps_left = steps_left
+        self.trajectories = None
+        self.depth = 0
+
+
+class EvaluationCacheStepTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = PlayerControllerMinimax()
+        self.controller.evaluation_cache = EvaluationCache()
+        self.controller.incremental_evaluation = False
+        self.evaluations = []
+
+        def evaluate(state):
+            self.evaluations.append(state.hash)
+            return float(len(self.evaluations))
+
+        self.controller.evaluator.evaluate = evaluate
+
+    def test_same_hash_at_two_steps(self):
+        first = self.controller.evaluate_position(FakePosition(1234, 10))
+        second = self.controller.evaluate_position(FakePosition(1234, 9))
+        self.assertEqual(len(self.evaluations), 2)
+        self.assertNotEqual(first, second)
+        # Both values are kept, each under its own step
+        self.assertEqual(self.controller.evaluate_position(FakePosition(1234, 10)), first)
+        self.assertEqual(self.controller.evaluate_position(FakePosition(1234, 9)), second)
+        self.assertEqual(len(self.evaluations), 2)
+
+
+class EvaluationCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = EvaluationCache(max_entries=3)
+        for key in (1, 2, 3):
+            cache.put(key, float(key))
+        # A hit makes 1 the most recently used, so 2 is evicted first
+        self.assertEqual(cache.get(1), 1.0)
+        cache.put(4, 4.0)
+        self.assertEqual(list(cache.values), [3, 1, 4])
+        self.assertIsNone(cache.get(2))
+        cache.put(5, 5.0)
+        self.assertEqual(list(cache.values), [1, 4, 5])
+        self.assertEqual(len(cache.values), cache.max_entries)
+
+    def test_counts_lookups_and_hits(self):
+        cache = EvaluationCache()
+        self.assertEqual(cache.hit_rate, 0.0)
+        cache.put(7, 0.5)
+        self.assertEqual(cache.get(7), 0.5)
+        self.assertIsNone(cache.get(8))
+        self.assertEqual(cache.get(7), 0.5)
+        self.assertIsNone(cache.get(9))
+        self.assertEqual((cache.lookups, cache.hits), (4, 2))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_new_search_resets_counters_only(self):
+        cache = EvaluationCache()
+        cache.put(7, 0.5)
+        cache.get(7)
+        cache.get(8)
+        cache.new_search()
+        self.assertEqual((cache.lookups, cache.hits), (0, 0))
+        self.assertEqual(cache.hit_rate, 0.0)
+        # The values are kept for the next turn
+        self.assertEqual(cache.get(7), 0.5)
+        self.assertEqual((cache.lookups, cache.hits), (1, 1))
+
+    def test_clear_removes_values_and_resets_counters(self):
+        cache = EvaluationCache()
+        cache.put(7, 0.5)
+        cache.get(7)
+        cache.clear()
+        self.assertEqual(len(cache.values), 0)
+        self.assertEqual((cache.lookups, cache.hits), (0, 0))
+        self.assertIsNone(cache.get(7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+
+from fishing_game_core import zobrist
+from fishing_game_core.transposition import (TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER,
+                                             shared_memory)
+from player import PlayerControllerMinimax
+
+# Value of a position that is searched instead of answered by the table
+SEARCHED = 99.0
+
+
+class FakeState:
+    def __init__(self, state_hash):
+        self.hash = state_hash
+
+
+class FakePosition:
+    """
+    Position at the end of the game, so that a search that goes past the probe evaluates it
+    """
+
+    def __init__(self, state_hash, steps_left):
+        self.state = FakeState(state_hash)
+        self.steps_left = steps_left
+        self.trajectories = None
+        self.depth = 0
+
+    def legal_moves(self):
+        return ()
+
+
+class ReplacementTests:
+    """
+    Replacement scheme shared by both tables. Keys 1, 3, 5, 7 and 9 all fall in slot 1 of a table of 4 entries.
+    """
+
+    def make_table(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.table = self.make_table()
+
+    def assertStored(self, key, depth, flag, value, move):
+        self.assertEqual(self.table.probe(key)[:5], (key, depth, flag, value, move))
+
+    def test_shallower_entry_goes_to_always_replace(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.store(3, 2, LOWER, 3.5, 4)
+        self.assertStored(1, 5, EXACT, 1.5, 2)
+        self.assertStored(3, 2, LOWER, 3.5, 4)
+        # The next shallower entry replaces it, the deepest one stays
+        self.table.store(5, 1, UPPER, 5.5, 0)
+        self.assertIsNone(self.table.probe(3))
+        self.assertStored(1, 5, EXACT, 1.5, 2)
+        self.assertStored(5, 1, UPPER, 5.5, 0)
+        self.assertEqual(self.table.evictions, 1)
+
+    def test_deeper_entry_moves_the_deepest_one_to_always_replace(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.store(5, 1, UPPER, 5.5, 0)
+        self.table.store(7, 6, EXACT, 7.5, 1)
+        self.assertStored(7, 6, EXACT, 7.5, 1)
+        self.assertStored(1, 5, EXACT, 1.5, 2)
+        self.assertIsNone(self.table.probe(5))
+
+    def test_older_search_entry_is_replaced_whatever_its_depth(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.new_search()
+        self.table.store(9, 1, LOWER, 9.5, 3)
+        self.assertStored(9, 1, LOWER, 9.5, 3)
+        self.assertStored(1, 5, EXACT, 1.5, 2)
+        self.assertEqual(self.table.probe(9)[5], self.table.generation)
+
+    def test_other_slot_is_not_touched(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.store(2, 0, EXACT, 2.5, 0)
+        self.assertStored(1, 5, EXACT, 1.5, 2)
+        self.assertStored(2, 0, EXACT, 2.5, 0)
+        self.assertIsNone(self.table.probe(4))
+        self.assertEqual(self.table.evictions, 0)
+
+    def test_clear(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.probe(1)
+        self.table.clear()
+        self.assertEqual(self.table.stats()["probes"], 0)
+        self.assertIsNone(self.table.probe(1))
+
+
+class TranspositionTableTest(ReplacementTests, unittest.TestCase):
+    def make_table(self):
+        return TranspositionTable(max_entries=4)
+
+
+@unittest.skipIf(shared_memory is None, "multiprocessing.shared_memory needs Python 3.8")
+class SharedTranspositionTableTest(ReplacementTests, unittest.TestCase):
+    def make_table(self):
+        table = SharedTranspositionTable(max_entries=4)
+        self.addCleanup(table.close, unlink=True)
+        return table
+
+    def test_attached_table_reads_the_same_entries(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        other = SharedTranspositionTable.attach(self.table.share())
+        self.addCleanup(other.close)
+        self.assertEqual(other.probe(1), self.table.probe(1))
+        other.store(3, 2, LOWER, 3.5, 4)
+        self.assertStored(3, 2, LOWER, 3.5, 4)
+
+    def test_torn_value_is_rejected(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        # Another process wrote its value but not yet the rest of its entry
+        self.table.values[1] = 8.5
+        self.assertIsNone(self.table.probe(1))
+
+    def test_torn_data_is_rejected(self):
+        self.table.store(1, 5, EXACT, 1.5, 2)
+        self.table.data[1] ^= 1
+        self.assertIsNone(self.table.probe(1))
+
+
+class TranspositionBoundTest(unittest.TestCase):
+    """
+    Use of the entries of the table by minimax and pvs at a position with a window (alpha, beta)
+    """
+
+    def setUp(self):
+        self.controller = PlayerControllerMinimax()
+        self.controller.transposition_table = TranspositionTable()
+        self.controller.incremental_evaluation = False
+        self.controller.evaluator.evaluate = lambda state: SEARCHED
+        self.position = FakePosition(1234, 10)
+
+    def store(self, depth, flag, value):
+        key = self.position.state.hash ^ zobrist.step_key(self.position.steps_left)
+        self.controller.transposition_table.store(key, depth, flag, value, 3)
+
+    def minimax(self, alpha, beta, depth=2):
+        return self.controller.minimax(self.position, True, depth, alpha, beta)
+
+    def test_exact_answers_any_window(self):
+        self.store(2, EXACT, 5.0)
+        self.assertEqual(self.minimax(-10.0, 10.0), (5.0, 3))
+        self.assertEqual(self.minimax(6.0, 10.0), (5.0, 3))
+
+    def test_lower_bound_answers_at_or_above_beta(self):
+        self.store(2, LOWER, 5.0)
+        self.assertEqual(self.minimax(0.0, 4.0), (5.0, 3))
+        self.assertEqual(self.minimax(0.0, 5.0), (5.0, 3))
+        self.assertEqual(self.minimax(0.0, 6.0), (SEARCHED, 0))
+
+    def test_upper_bound_answers_at_or_below_alpha(self):
+        self.store(2, UPPER, 5.0)
+        self.assertEqual(self.minimax(6.0, 10.0), (5.0, 3))
+        self.assertEqual(self.minimax(5.0, 10.0), (5.0, 3))
+        self.assertEqual(self.minimax(4.0, 10.0), (SEARCHED, 0))
+
+    def test_shallower_entry_is_not_used(self):
+        self.store(1, EXACT, 5.0)
+        self.assertEqual(self.minimax(-10.0, 10.0), (SEARCHED, 0))
+
+    def test_pvs_reads_the_bounds_of_player_0_for_player_1(self):
+        # A lower bound of 5 for player 0 is an upper bound of -5 for player 1
+        self.store(2, LOWER, 5.0)
+        self.assertEqual(self.controller.pvs(self.position, 2, -4.0, 10.0, -1), (-5.0, 3))
+        self.assertEqual(self.controller.pvs(self.position, 2, -6.0, 10.0, -1), (-SEARCHED, 0))
+        # and still a lower bound for player 0 itself
+        self.assertEqual(self.controller.pvs(self.position, 2, 0.0, 4.0, 1), (5.0, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
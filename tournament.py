@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import glob
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import yaml
+
+from fishing_game_core.headless import HeadlessGame, RandomModel, minimax_model, DEFAULT_SEED
+from main import Settings
+
+RESULT_FIELDS = ["observations_file", "seed", "score_difference", "score_p0", "score_p1", "steps", "timeouts",
+                 "mean_latency_ms", "p99_latency_ms", "mean_depth", "mean_re_searches",
+                 "mean_evaluation_cache_hit_rate", "error"]
+
+
+def load_settings(config_file):
+    """
+    Load the settings of the games
+    :param config_file: path to a settings file, or None for the default settings
+    :return: main.Settings instance
+    """
+    settings = Settings()
+    if config_file is not None:
+        settings.load_from_dict(yaml.safe_load(open(config_file, 'r')))
+    settings.player_type = "ai_minimax"
+    return settings
+
+
+def play_game(player_module, opponent, settings, observations_file, seed):
+    """
+    Play one headless game. Run in the worker processes of the tournament.
+    :param player_module: name of the module defining the PlayerControllerMinimax class of the player
+    :param opponent: "minimax" for opponent.MinimaxModel or "random" for headless.RandomModel
+    :param settings: main.Settings instance
+    :param observations_file: path to an observations file
+    :param seed: seed of the game
+    :return: (dict with the RESULT_FIELDS, list of the response times of the player)
+    """
+    player_controller = importlib.import_module(player_module).PlayerControllerMinimax()
+    opponent_model = minimax_model if opponent == "minimax" else partial(RandomModel, seed=seed)
+    settings.observations_file = observations_file
+    game = HeadlessGame(opponent_model=opponent_model, seed=seed)
+    game.load_settings(settings)
+    error = ""
+    try:
+        game.run(player_controller)
+    except TimeoutError:
+        error = "timeout"
+    except (Exception, SystemExit) as e:
+        # The compiled opponent exits when it cannot run on this platform
+        error = type(e).__name__
+    stats = game.get_stats() if game.players and game.players[0].boat is not None else None
+
+    latencies = np.array(game.response_times) * 1000
+    result = {"observations_file": observations_file,
+              "seed": seed,
+              "score_difference": stats["score_p0"] - stats["score_p1"] if stats else "",
+              "score_p0": stats["score_p0"] if stats else "",
+              "score_p1": stats["score_p1"] if stats else "",
+              "steps": stats["steps"] if stats else "",
+              "timeouts": stats["timeouts"] if stats else "",
+              "mean_latency_ms": round(latencies.mean(), 2) if len(latencies) else "",
+              "p99_latency_ms": round(np.percentile(latencies, 99), 2) if len(latencies) else "",
+              "mean_depth": round(np.mean(game.search_depths), 2) if game.search_depths else "",
+              "mean_re_searches": round(np.mean(game.re_searches), 2) if game.re_searches else "",
+              "mean_evaluation_cache_hit_rate": (round(np.mean(game.evaluation_cache_hit_rates), 3)
+                                                 if game.evaluation_cache_hit_rates else ""),
+              "error": error}
+    return result, game.response_times
+
+
+def run_tournament(player_module, opponent, settings, observations_files, seeds, workers):
+    """
+    Play a game for every observations file and seed, in parallel
+    :return: (list of result dicts, list of all the response times of the player)
+    """
+    games = [(observations_file, seed) for observations_file in observations_files for seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, player_module, opponent, settings, observations_file, seed)
+                   for observations_file, seed in games]
+        results, response_times = [], []
+        for future in futures:
+            result, times = future.result()
+            results.append(result)
+            response_times.extend(times)
+            print(f"{result['observations_file']}\tseed {result['seed']}\t"
+                  f"score difference: {result['score_difference']}\t"
+                  f"timeouts: {result['timeouts']}\t{result['error']}")
+    return results, response_times
+
+
+def print_summary(results, response_times):
+    """
+    Print the totals of a tournament
+    :param results: list of result dicts
+    :param response_times: list of all the response times of the player, in seconds
+    :return:
+    """
+    played = [r for r in results if r["score_difference"] != ""]
+    differences = [r["score_difference"] for r in played]
+    depths = [r["mean_depth"] for r in played if r["mean_depth"] != ""]
+    re_searches = [r["mean_re_searches"] for r in played if r["mean_re_searches"] != ""]
+    hit_rates = [r["mean_evaluation_cache_hit_rate"] for r in played if r["mean_evaluation_cache_hit_rate"] != ""]
+    latencies = np.array(response_times) * 1000
+    print(f"games: {len(results)}\terrors: {sum(1 for r in results if r['error'])}")
+    if differences:
+        print(f"mean score difference: {np.mean(differences):.2f}\t"
+              f"won: {sum(d > 0 for d in differences)}\tdrawn: {sum(d == 0 for d in differences)}\t"
+              f"lost: {sum(d < 0 for d in differences)}")
+        print(f"timeouts: {sum(r['timeouts'] for r in played)}")
+    if len(latencies):
+        print(f"latency mean: {latencies.mean():.1f} ms\tp99: {np.percentile(latencies, 99):.1f} ms\t"
+              f"max: {latencies.max():.1f} ms")
+    if depths:
+        print(f"mean depth: {np.mean(depths):.2f}")
+    if re_searches:
+        print(f"mean re-searches per turn: {np.mean(re_searches):.2f}")
+    if hit_rates:
+        print(f"mean evaluation cache hit rate per turn: {np.mean(hit_rates):.3f}")
+
+
+if __name__ == '__main__':
+    # Arguments parsing
+    arguments_parser = argparse.ArgumentParser(
+        description="Play headless games of a player against the opponent over observation files and seeds")
+    arguments_parser.add_argument("observations_files", type=str, nargs="*",
+                                  default=sorted(glob.glob("observations/*.json")), help="Observations files")
+    arguments_parser.add_argument("--player", type=str, default="player",
+                                  help="Module of the player, defining PlayerControllerMinimax")
+    arguments_parser.add_argument("--opponent", type=str, default="minimax", choices=["minimax", "random"],
+                                  help="Opponent: opponent.MinimaxModel or random moves")
+    arguments_parser.add_argument("--seeds", type=int, default=1, help="Number of seeds per observations file")
+    arguments_parser.add_argument("--first-seed", type=int, default=DEFAULT_SEED, help="First seed")
+    arguments_parser.add_argument("--config", type=str, default=None, help="Settings file of the games")
+    arguments_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                                  help="Number of games played at the same time")
+    arguments_parser.add_argument("--results", type=str, default="tournament_results.csv",
+                                  help="CSV file where the result of every game is written")
+    args = arguments_parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    results, response_times = run_tournament(args.player, args.opponent, load_settings(args.config),
+                                             args.observations_files, seeds, args.workers)
+    with open(args.results, 'w', newline='') as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    print_summary(results, response_times)